@@ -11,7 +11,8 @@ class UserAdmin(UserAdmin): # class UserAdmin(admin.ModelAdmin):
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'author', 'is_active', 'created_at', 'updated_at')
+    list_display = ('id', 'title', 'author', 'answer_count', 'is_active', 'created_at', 'updated_at')
+    readonly_fields = ('answer_count', )
 
     class AnswerInline(admin.TabularInline):
         model = Answer
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa: F401
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.views.generic import View
+from django.views.generic.base import ContextMixin
+from django.views.generic.detail import SingleObjectMixin
+
+from core.profiling import record_cache
+from core.sidebar import SIDEBAR_CACHE_KEY, best_users, popular_tags
+from core.views import HotQuestionsView, IndexView, QuestionDetailView, TagView
+
+
+def in_thread(func, *args):
+    """Выполняет синхронный код с ORM в отдельном потоке со своим соединением с БД.
+
+    Обычные async-методы ORM (aget, acount, ...) в Django 4.2 все идут через один поток запроса,
+    поэтому независимые запросы страницы так не распараллелить.
+    """
+    def run():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def _evaluated(page_obj):
+    # Страница должна загрузиться в рабочем потоке, а не лениво при рендере шаблона.
+    page_obj.object_list = list(page_obj.object_list)
+    return page_obj
+
+
+async def async_sidebar_context():
+    context = await cache.aget(SIDEBAR_CACHE_KEY)
+    if context is not None:
+        record_cache(hits=1)
+        return context
+    record_cache(misses=1)
+    tags, users = await asyncio.gather(in_thread(popular_tags), in_thread(best_users))
+    context = {'tags': tags, 'best_users': users, 'built_at': time.time()}
+    await cache.aset(SIDEBAR_CACHE_KEY, context, settings.SIDEBAR_CACHE_TIMEOUT)
+    return context
+
+
+class AsyncViewMixin:
+    """GET выполняется асинхронно, POST (голосование, ответы) — синхронным обработчиком родителя в потоке.
+
+    dispatch берётся из View: кеш страниц родителя навешан на dispatch и оборачивается в urls.py заново.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        return View.dispatch(self, request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class AsyncListingMixin(AsyncViewMixin):
+    async def get(self, request, *args, **kwargs):
+        questions, ordering, extra = await in_thread(self.get_listing)
+        page_obj, sidebar = await asyncio.gather(
+            in_thread(lambda: _evaluated(self.get_page(questions, ordering))),
+            async_sidebar_context(),
+        )
+        context = ContextMixin.get_context_data(self, **kwargs)
+        context.update(self.listing_context(page_obj, extra, sidebar))
+        return self.render_to_response(context)
+
+
+class AsyncIndexView(AsyncListingMixin, IndexView):
+    pass
+
+
+class AsyncHotQuestionsView(AsyncListingMixin, HotQuestionsView):
+    # У синхронной страницы нет POST; без него в списке методов все обработчики асинхронные.
+    http_method_names = ['get', 'head', 'options']
+
+
+class AsyncTagView(AsyncListingMixin, TagView):
+    pass
+
+
+class AsyncQuestionDetailView(AsyncViewMixin, QuestionDetailView):
+    async def get(self, request, *args, **kwargs):
+        # Вопрос, страница ответов и сайдбар не зависят друг от друга: ответы ищутся по id из URL.
+        # Голоса пользователя грузятся в том же потоке, что и ответы: request.user ленивый.
+        question_id = kwargs[self.pk_url_kwarg]
+        question, (page_obj, question_vote), sidebar = await asyncio.gather(
+            in_thread(self.get_object),
+            in_thread(lambda: (_evaluated(self.answers_page(question_id)), self.question_vote(question_id))),
+            async_sidebar_context(),
+        )
+        question.user_vote = question_vote
+        self.object = question
+        context = SingleObjectMixin.get_context_data(self, **kwargs)
+        context.update(self.detail_context(page_obj, sidebar))
+        return self.render_to_response(context)
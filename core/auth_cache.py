@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from core.profiling import record_cache
+
+
+def user_cache_key(user_id):
+    return f'core:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который достаёт пользователя сессии из кеша, а не из БД на каждый запрос.
+
+    Кешируется весь объект: шаблонам нужны username и аватар, а проверке сессии — хеш пароля.
+    Запись сбрасывается при сохранении и удалении пользователя (core/signals.py)
+    и после обработки аватара; USER_CACHE_TIMEOUT = 0 выключает кеш.
+    """
+
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is not None:
+            record_cache(hits=1)
+            return user
+        record_cache(misses=1)
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Размеры превью (px); каждое сохраняется в WebP и в JPEG для старых браузеров.
+AVATAR_SIZES = (50, 100)
+AVATAR_CACHE_DIR = 'avatars/cache'
+
+_executor = None
+
+
+def variant_name(content_hash, size, ext):
+    return f'{AVATAR_CACHE_DIR}/{content_hash}_{size}.{ext}'
+
+
+def _get_executor():
+    # Пул потоков — локальная замена очереди задач: ресайз не занимает WSGI-воркер.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatars')
+    return _executor
+
+
+def _save_variant(image, name, fmt, **params):
+    if default_storage.exists(name):
+        return
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **params)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render_variants(source_bytes):
+    """Создаёт превью всех размеров; возвращает хеш содержимого, по которому строятся имена файлов."""
+    content_hash = hashlib.sha256(source_bytes).hexdigest()[:16]
+    with Image.open(BytesIO(source_bytes)) as original:
+        image = original.convert('RGBA')
+    for size in AVATAR_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        _save_variant(thumbnail, variant_name(content_hash, size, 'webp'), 'WEBP', quality=80)
+        # JPEG без прозрачности: подкладываем белый фон.
+        flat = Image.new('RGB', thumbnail.size, 'white')
+        flat.paste(thumbnail, mask=thumbnail.getchannel('A'))
+        _save_variant(flat, variant_name(content_hash, size, 'jpg'), 'JPEG', quality=85)
+    return content_hash
+
+
+def process_avatar(user_id, avatar_name):
+    from core.auth_cache import invalidate_user
+    from core.models import User
+
+    try:
+        with default_storage.open(avatar_name, 'rb') as source:
+            content_hash = render_variants(source.read())
+        # Пока шла обработка, аватар могли сменить ещё раз — тогда результат уже не нужен.
+        User.objects.filter(pk=user_id, avatar=avatar_name).update(avatar_hash=content_hash)
+        # update() обходит сигналы: закешированный пользователь сессии ещё без превью.
+        invalidate_user(user_id)
+        return content_hash
+    except Exception:
+        logger.exception('Не удалось обработать аватар %s пользователя %s', avatar_name, user_id)
+        return None
+    finally:
+        if settings.AVATAR_PROCESSING != 'sync':
+            close_old_connections()
+
+
+def schedule_avatar_processing(user):
+    """Ставит обработку аватара в очередь после коммита транзакции (синхронно, если AVATAR_PROCESSING='sync')."""
+    user_id, avatar_name = user.pk, user.avatar.name
+    if settings.AVATAR_PROCESSING == 'sync':
+        transaction.on_commit(lambda: process_avatar(user_id, avatar_name))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(process_avatar, user_id, avatar_name))
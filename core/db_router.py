@@ -0,0 +1,79 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+
+# Состояние текущего запроса: словарь, а не флаг, чтобы запись из потока sync_to_async
+# (у него копия контекста) была видна всему запросу.
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def _pinned():
+    state = _request_state.get()
+    return state is not None and (state['cookie'] or state['wrote'])
+
+
+class PrimaryReplicaRouter:
+    """Чтения — на реплики из DATABASE_REPLICAS, записи — на основную БД.
+
+    Чтение идёт на основную БД внутри транзакции, после записи в этом же запросе
+    и ещё REPLICA_PIN_SECONDS после записи у того же клиента (read-your-writes).
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or _pinned() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """После записи ставит cookie, и чтения этого клиента какое-то время идут на основную БД."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {'cookie': settings.REPLICA_PIN_COOKIE in request.COOKIES, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state = {'cookie': settings.REPLICA_PIN_COOKIE in request.COOKIES, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state['wrote'] and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
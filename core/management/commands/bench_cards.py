@@ -0,0 +1,58 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from core.templatetags.question_cards import card_cache_stats, reset_card_cache_stats
+from core.views import IndexView
+
+
+class Command(BaseCommand):
+    help = 'Время рендера главной страницы для анонимного посетителя с кешем карточек вопросов и без него'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=5, help='Сколько первых страниц списка обходить')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def render_pages(self, pages, repeat):
+        factory = RequestFactory()
+        view = IndexView.as_view()
+        timings = []
+        for _ in range(repeat):
+            for page in range(1, pages + 1):
+                request = factory.get('/', {'page': page})
+                request.user = AnonymousUser()
+                started = time.perf_counter()
+                view(request).render()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        }
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def handle(self, *args, **options):
+        # Кеш целых страниц выключен: меряем именно сборку страницы из карточек.
+        results = {}
+        with override_settings(QUESTION_CARD_CACHE_TIMEOUT=0):
+            results['without_cache'] = self.render_pages(options['pages'], options['repeat'])
+
+        cache.clear()
+        reset_card_cache_stats()
+        results['with_cache'] = self.render_pages(options['pages'], options['repeat'])
+        results['with_cache'].update(card_cache_stats())
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, row in results.items():
+            line = f"{name}: median {row['median_ms']:.2f} ms, p95 {row['p95_ms']:.2f} ms"
+            if 'hit_rate' in row:
+                line += f", попаданий в кеш {row['hit_rate']:.1%} ({row['hits']}/{row['hits'] + row['misses']})"
+            self.stdout.write(line)
@@ -0,0 +1,96 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.models import Question, Answer, Tag, User
+
+
+class Command(BaseCommand):
+    help = ('Замер горячих запросов списков и страницы вопроса: EXPLAIN QUERY PLAN и время. '
+            'При нехватке данных команда досоздаёт вопросы и после замера откатывает их (кроме --keep).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100_000,
+                            help='Минимальное число вопросов в БД перед замером')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true',
+                            help='Сохранить досозданные вопросы в БД, чтобы не создавать их при следующем замере')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        # Всё в одной транзакции: без --keep тестовые вопросы не остаются в рабочей БД.
+        with transaction.atomic():
+            results = self.run(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{results['vendor']}, вопросов: {results['questions']}")
+        for name, row in results['queries'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{name}: median {row['median_ms']:.3f} ms, p95 {row['p95_ms']:.3f} ms"
+            ))
+            self.stdout.write(row['plan'])
+
+    def run(self, options):
+        self.ensure_questions(options['questions'])
+
+        tag = Tag.objects.annotate(usage=Count('question')).order_by('-usage').first()
+        question = Question.objects.order_by('-answer_count').first()
+        active = Question.objects.active()
+
+        queries = {
+            'index_new': active.order_by('-created_at', '-id')[:20],
+            'index_rating': active.order_by('-rating', '-id')[:20],
+            'hot': active.order_by('-hot_score', '-id')[:20],
+            'index_answers': active.order_by('-answer_count', '-created_at', '-id')[:20],
+            'index_unanswered': active.filter(answer_count=0).order_by('-created_at', '-id')[:20],
+            'tag_page': active.filter(tags=tag).order_by('-created_at', '-id')[:20],
+            'tag_lookup': Tag.objects.filter(title=tag.title),
+            'question_answers': Answer.objects.filter(question=question).order_by('-rating', '-created_at')[:30],
+        }
+
+        return {
+            'vendor': connection.vendor,
+            'questions': Question.objects.count(),
+            'queries': {name: self.measure(qs, options['repeat']) for name, qs in queries.items()},
+        }
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'plan': queryset.explain(),
+            'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        }
+
+    def ensure_questions(self, required):
+        missing = required - Question.objects.count()
+        if missing <= 0:
+            return
+        self.stderr.write(f'Досоздаём вопросов: {missing}')
+        author, _ = User.objects.get_or_create(username='bench')
+        tags = [Tag.objects.get_or_create(title=f'bench{i}')[0] for i in range(50)]
+        Through = Question.tags.through
+        for start in range(0, missing, 5000):
+            batch = Question.objects.bulk_create([
+                Question(title=f'Bench question {start + i}', detailed='Bench', author=author,
+                         rating=random.randint(-50, 50), answer_count=random.randint(0, 10))
+                for i in range(min(5000, missing - start))
+            ])
+            Through.objects.bulk_create([
+                Through(question_id=q.id, tag_id=random.choice(tags).id) for q in batch
+            ])
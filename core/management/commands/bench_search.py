@@ -0,0 +1,76 @@
+import json
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Question, Answer
+from core.search import get_backend
+from core.sidebar import invalidate_sidebar
+
+QUERIES = ['question', 'detailed text', 'answer', 'question 1', 'text 42', 'answer text 7', 'нет такого']
+
+
+class Command(BaseCommand):
+    help = ('Задержка поиска в зависимости от объёма корпуса: для каждого ratio дозаполняет БД через fill_db, '
+            'перестраивает индекс и замеряет запросы. После замера данные откатываются (кроме --keep).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('ratios', nargs='+', type=int, help='Значения ratio для fill_db, по возрастанию')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Сохранить созданные fill_db данные в БД')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        # Как в bench_queries: всё в одной транзакции, без --keep корпус не остаётся в рабочей БД.
+        with transaction.atomic():
+            runs = self.run(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+        if not options['keep']:
+            # fill_db сбросил сайдбар внутри транзакции — он мог собраться по откатанным данным.
+            invalidate_sidebar()
+
+        if options['json']:
+            self.stdout.write(json.dumps({'backend': type(get_backend()).__name__, 'runs': runs},
+                                         ensure_ascii=False, indent=2))
+
+    def run(self, options):
+        backend = get_backend()
+        runs = []
+        for ratio in options['ratios']:
+            call_command('fill_db', ratio, stdout=self.stderr)
+            backend.rebuild()
+            run = {
+                'ratio': ratio,
+                'questions': Question.objects.count(),
+                'answers': Answer.objects.count(),
+                'queries': {query: self.measure(backend, query, options['repeat']) for query in QUERIES},
+            }
+            runs.append(run)
+            if not options['json']:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"ratio={ratio}: вопросов {run['questions']}, ответов {run['answers']}"
+                ))
+                for query, row in run['queries'].items():
+                    self.stdout.write(
+                        f"  {query!r}: median {row['median_ms']:.3f} ms, p95 {row['p95_ms']:.3f} ms, "
+                        f"найдено {row['results']}"
+                    )
+        return runs
+
+    def measure(self, backend, query, repeat):
+        timings = []
+        results = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = backend.search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            'results': len(results),
+        }
@@ -0,0 +1,95 @@
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Question, User
+from core.profiling import summarize
+
+BENCH_USERNAME = 'bench_sessions'
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+# Запросы к самим таблицам сессий и пользователей (JOIN автора в списках не в счёт).
+# Время жизни кеша пользователя в прогонах «+user_cache», если в настройках он выключен.
+DEFAULT_USER_CACHE_TIMEOUT = 300
+AUTH_QUERY = re.compile(r'(FROM|UPDATE|INTO) "(django_session|core_user)"')
+
+
+class Command(BaseCommand):
+    help = ('Сколько запросов к БД стоит сессия и пользователь на каждом запросе: режимы SESSION_MODE '
+            'с кешем пользователя (core.auth_cache) и без него. Данные, созданные замером, откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('modes', nargs='*', default=list(SESSION_ENGINES))
+        parser.add_argument('--repeat', type=int, default=20, help='Запросов на маршрут')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        unknown = set(options['modes']) - set(SESSION_ENGINES)
+        if unknown:
+            raise CommandError(f'Неизвестные режимы: {", ".join(sorted(unknown))}')
+        question = Question.objects.order_by('id').first()
+        if question is None:
+            raise CommandError('В БД нет вопросов: сначала fill_db')
+        routes = {
+            'index_anonymous': (reverse('index'), False),
+            'index': (reverse('index'), True),
+            'question': (reverse('question', args=[question.id]), True),
+            'settings': (reverse('user_settings'), True),
+        }
+
+        user_cache_timeout = settings.USER_CACHE_TIMEOUT or DEFAULT_USER_CACHE_TIMEOUT
+        results = {}
+        with transaction.atomic():
+            user = User.objects.create_user(username=BENCH_USERNAME, password=BENCH_USERNAME)
+            for mode in options['modes']:
+                for user_cache in (False, True):
+                    name = f"{mode}{'+user_cache' if user_cache else ''}"
+                    with override_settings(SESSION_ENGINE=SESSION_ENGINES[mode], PAGE_CACHE_TIMEOUT=0,
+                                           USER_CACHE_TIMEOUT=user_cache_timeout if user_cache else 0,
+                                           PROFILING_LOG_FILE=''):
+                        cache.clear()
+                        results[name] = {
+                            route: self.run(user, url, auth, options['repeat'])
+                            for route, (url, auth) in routes.items()
+                        }
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, rows in results.items():
+            self.stdout.write(name)
+            for route, row in rows.items():
+                self.stdout.write(
+                    f"  {route:<18}запросов {row['avg_queries']:>5.1f}  из них сессия и пользователь "
+                    f"{row['avg_auth_queries']:>4.1f}  p50 {row['p50_ms']:.1f} мс"
+                )
+
+    def run(self, user, url, auth, repeat):
+        # Новый клиент на каждый режим: middleware сессий читает SESSION_ENGINE при создании обработчика.
+        client = Client()
+        if auth:
+            client.force_login(user)
+        client.get(url)
+        timings, queries, auth_queries = [], 0, 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries += len(captured)
+            auth_queries += sum(bool(AUTH_QUERY.search(query['sql'])) for query in captured.captured_queries)
+        row = summarize({'route': timings})['route']
+        row.update({'avg_queries': queries / repeat, 'avg_auth_queries': auth_queries / repeat})
+        return row
@@ -0,0 +1,133 @@
+import json
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import override_settings
+
+from core.models import Question, Answer, User, Vote
+from core.profiling import summarize
+from core.voting import vote_question
+
+
+class Command(BaseCommand):
+    help = ('Конкурентная запись в SQLite (голоса и ответы из нескольких потоков) при разных профилях '
+            'SQLITE_PROFILES: пропускная способность и доля ошибок «database is locked». '
+            'Каждый профиль проверяется на отдельной временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['default', 'tuned'])
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Операций записи на поток')
+        parser.add_argument('--questions', type=int, default=10, help='Число «горячих» вопросов, за которые голосуют')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        unknown = set(options['profiles']) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f'Нет таких профилей в SQLITE_PROFILES: {", ".join(sorted(unknown))}')
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда замеряет только SQLite')
+
+        results = {}
+        with override_settings(VOTE_BUFFERING=False, DATABASE_REPLICAS=[]):
+            for profile in options['profiles']:
+                with tempfile.TemporaryDirectory() as directory:
+                    with self.database(Path(directory) / 'bench.sqlite3', settings.SQLITE_PROFILES[profile]):
+                        self.seed(options)
+                        results[profile] = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for profile, row in results.items():
+            self.stdout.write(
+                f"{profile:<10}{row['ops_per_second']:>9.1f} оп/с  ошибок блокировки {row['lock_errors']}"
+                f" ({row['lock_error_rate']:.1%})  p50 {row['p50_ms']:.1f} мс  p99 {row['p99_ms']:.1f} мс"
+            )
+
+    @contextmanager
+    def database(self, path, profile_options):
+        # Подменяем NAME и OPTIONS у default: новые соединения во всех потоках откроют временную БД.
+        saved = {key: connections.settings['default'][key] for key in ('NAME', 'OPTIONS')}
+        connections['default'].close()
+        connections.settings['default'].update(NAME=str(path), OPTIONS=profile_options)
+        try:
+            call_command('migrate', verbosity=0)
+            yield
+        finally:
+            connections['default'].close()
+            connections.settings['default'].update(saved)
+
+    def seed(self, options):
+        password = make_password(None)
+        User.objects.bulk_create([User(username=f'writer{i}', password=password) for i in range(options['threads'])])
+        author = User.objects.first()
+        Question.objects.bulk_create([
+            Question(title=f'Question {i}', slug=f'question-{i}', detailed='Text', author=author)
+            for i in range(options['questions'])
+        ])
+
+    def run(self, options):
+        users = list(User.objects.order_by('id')[:options['threads']])
+        questions = list(Question.objects.order_by('id'))
+        timings, lock_errors, other_errors = [], [], []
+        barrier = threading.Barrier(options['threads'])
+
+        def worker(index):
+            rnd = random.Random(options['seed'] + index)
+            user = users[index]
+            local_timings, locks, errors = [], 0, 0
+            barrier.wait()
+            try:
+                for _ in range(options['operations']):
+                    question = rnd.choice(questions)
+                    started = time.perf_counter()
+                    try:
+                        if rnd.random() < 0.7:
+                            vote_question(user, question, rnd.choice((Vote.UPVOTE, Vote.DOWNVOTE)))
+                        else:
+                            with transaction.atomic():
+                                Answer.objects.create(question=question, author=user, answer_text='Ответ')
+                    except OperationalError as error:
+                        if 'locked' in str(error):
+                            locks += 1
+                        else:
+                            errors += 1
+                        continue
+                    local_timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+            timings.extend(local_timings)
+            lock_errors.append(locks)
+            other_errors.append(errors)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = options['threads'] * options['operations']
+        row = summarize({'writes': timings})['writes']
+        row.update({
+            'operations': total,
+            'succeeded': len(timings),
+            'lock_errors': sum(lock_errors),
+            'lock_error_rate': sum(lock_errors) / total,
+            'other_errors': sum(other_errors),
+            'ops_per_second': len(timings) / elapsed,
+            'journal_mode': connection.cursor().execute('PRAGMA journal_mode').fetchone()[0],
+        })
+        return row
@@ -0,0 +1,227 @@
+import json
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Question, Answer, Tag, User
+from core.profiling import summarize
+
+BENCH_USERNAME = 'bench'
+PAGE_DEPTHS = (1, 10, 100)
+# Время жизни страниц с --page-cache, если в настройках кеш страниц выключен (свой кеш у каждого процесса).
+DEFAULT_PAGE_CACHE_TIMEOUT = 60
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер всех страниц core/urls.py: списки (сортировки, теги, глубина страниц), '
+            'вопрос с ответами, голосование и ответ (POST). Результат — в JSON для сравнения между коммитами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ratio', type=int, default=0,
+                            help='Заполнить БД через fill_db с этим множителем, если вопросов меньше ratio*10')
+        parser.add_argument('--seed', type=int, default=1, help='Seed для fill_db')
+        parser.add_argument('--repeat', type=int, default=20, help='Запросов на маршрут через тестовый клиент')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Потоков HTTP-нагрузки на локальный WSGI-сервер (0 — не запускать)')
+        parser.add_argument('--requests', type=int, default=200, help='HTTP-запросов на маршрут')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Не выключать кеш целых страниц для анонимных посетителей')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+        parser.add_argument('--output', default=None, help='Записать JSON-результат в файл')
+
+    def handle(self, *args, **options):
+        if options['ratio'] and Question.objects.count() < options['ratio'] * 10:
+            self.stderr.write(f"Заполняем БД: fill_db {options['ratio']} --seed {options['seed']}")
+            call_command('fill_db', options['ratio'], seed=options['seed'], stdout=self.stderr)
+
+        page_cache = (settings.PAGE_CACHE_TIMEOUT or DEFAULT_PAGE_CACHE_TIMEOUT) if options['page_cache'] else 0
+        with override_settings(PAGE_CACHE_TIMEOUT=page_cache, PROFILING_LOG_FILE=''):
+            routes = self.routes()
+            results = {
+                'meta': self.meta(options),
+                'client': {name: self.run_client(route, options['repeat']) for name, route in routes.items()},
+            }
+            if options['concurrency']:
+                get_routes = {name: route for name, route in routes.items() if route['method'] == 'GET'}
+                results['http'] = self.run_http(get_routes, options['concurrency'], options['requests'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.report(results)
+
+    def routes(self):
+        question = Question.objects.active().order_by('-answer_count', 'id').first()
+        tag = Tag.objects.annotate(usage=Count('question')).order_by('-usage', 'id').first()
+        if question is None or tag is None:
+            raise CommandError('В БД нет вопросов или тегов: запустите с --ratio N')
+        answer = question.answer_set.order_by('id').first()
+        word = question.title.split()[0]
+        question_url = reverse('question', args=[question.id])
+
+        def get(url, auth=False, **params):
+            return {'method': 'GET', 'url': url, 'params': params, 'auth': auth}
+
+        def post(url, **data):
+            return {'method': 'POST', 'url': url, 'params': data, 'auth': True}
+
+        routes = {}
+        for sort in ('date', 'rating', 'answers', 'unanswered'):
+            for depth in PAGE_DEPTHS:
+                routes[f'index_{sort}_p{depth}'] = get(reverse('index'), sort=sort, page=depth)
+        for depth in PAGE_DEPTHS:
+            routes[f'hot_p{depth}'] = get(reverse('hot'), page=depth)
+            routes[f'tag_p{depth}'] = get(reverse('tag_page', args=[tag.title]), page=depth)
+        routes.update({
+            'question_detail': get(question_url),
+            'question_detail_auth': get(question_url, auth=True),
+            'search': get(reverse('search'), q=word),
+            'tag_autocomplete': get(reverse('tag_autocomplete'), q=tag.title[:2]),
+            'ask': get(reverse('ask_question'), auth=True),
+            'settings': get(reverse('user_settings'), auth=True),
+            'login': get(reverse('login')),
+            'signup': get(reverse('signup')),
+            'vote_question': post(reverse('index'), question_id=question.id, vote='up'),
+            'vote_question_api': post(reverse('api_question_vote', args=[question.id]), vote='up'),
+            'answer': post(question_url, answer_text='Ответ из нагрузочного теста'),
+        })
+        if answer is not None:
+            routes['vote_answer'] = post(question_url, vote_answer=answer.id, vote_value='up')
+            routes['vote_answer_api'] = post(reverse('api_answer_vote', args=[answer.id]), vote='up')
+        return routes
+
+    def bench_user(self):
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        if created:
+            user.set_password(BENCH_USERNAME)
+            user.save()
+        return user
+
+    def run_client(self, route, repeat):
+        client = Client()
+        if route['auth']:
+            client.force_login(self.bench_user())
+        send = client.get if route['method'] == 'GET' else client.post
+        timings, queries = [], 0
+        # POST-маршруты откатываются, чтобы повторные прогоны шли по одинаковым данным.
+        with transaction.atomic():
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = send(route['url'], route['params'])
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries += len(captured)
+            if route['method'] == 'POST':
+                transaction.set_rollback(True)
+        row = summarize({'route': timings})['route']
+        row.update({
+            'status': response.status_code,
+            'avg_queries': queries / repeat,
+            'rps': repeat / (sum(timings) / 1000),
+        })
+        return row
+
+    def run_http(self, routes, concurrency, requests):
+        # Настоящий WSGI-сервер в фоновом потоке: каждый запрос — отдельный поток и своё соединение с БД.
+        server = make_server('127.0.0.1', 0, WSGIHandler(),
+                             server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        session = self.session_cookie() if any(route['auth'] for route in routes.values()) else None
+
+        def fetch(route):
+            url = base + route['url']
+            if route['params']:
+                url += '?' + urlencode(route['params'])
+            request = Request(url)
+            if route['auth']:
+                request.add_header('Cookie', session)
+            started = time.perf_counter()
+            with urlopen(request) as response:
+                response.read()
+            return (time.perf_counter() - started) * 1000
+
+        results = {}
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for name, route in routes.items():
+                    started = time.perf_counter()
+                    timings = list(pool.map(fetch, [route] * requests))
+                    elapsed = time.perf_counter() - started
+                    row = summarize({name: timings})[name]
+                    row['rps'] = requests / elapsed
+                    results[name] = row
+        finally:
+            server.shutdown()
+            server.server_close()
+        return results
+
+    def session_cookie(self):
+        client = Client()
+        client.force_login(self.bench_user())
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        return f'{settings.SESSION_COOKIE_NAME}={cookie.value}'
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'vendor': connection.vendor,
+            'questions': Question.objects.count(),
+            'answers': Answer.objects.count(),
+            'page_cache': bool(options['page_cache']),
+            'repeat': options['repeat'],
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+        }
+
+    def report(self, results):
+        meta = results['meta']
+        self.stdout.write(f"{meta['commit']} {meta['vendor']}, вопросов: {meta['questions']}, ответов: {meta['answers']}")
+        for section in ('client', 'http'):
+            if section not in results:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(section))
+            for name, row in results[section].items():
+                line = (f"{name:<24}{row['rps']:>9.1f} req/s  p50 {row['p50_ms']:>7.2f}  "
+                        f"p95 {row['p95_ms']:>7.2f}  p99 {row['p99_ms']:>7.2f} ms")
+                if 'avg_queries' in row:
+                    line += f"  SQL {row['avg_queries']:.1f}"
+                self.stdout.write(line)
@@ -0,0 +1,87 @@
+import json
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.static_files import brotli
+
+PIPELINE_STORAGE = 'core.static_files.PrecompressedManifestStaticFilesStorage'
+STATIC_TAG = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]""")
+# Ресурсы с внешних хостов в шаблонах и CSS: на них ждёт первая отрисовка.
+EXTERNAL_ASSET = re.compile(r"""(?:<link[^>]+href|<script[^>]+src|url\()\s*=?\s*['"]?((?:https?:)?//[^'")\s>]+)""")
+# Шрифт Coming Soon пока грузится с Google Fonts: файла шрифта нет в core/static/fonts/.
+# Такие ссылки — предупреждение, а не ошибка; после самохостинга шрифта список нужно очистить.
+FONT_HOSTS = ('fonts.googleapis.com', 'fonts.gstatic.com')
+
+
+class Command(BaseCommand):
+    help = ('Собирает статику продакшен-сборкой (хешированные имена, .gz/.br) во временный каталог: '
+            'время collectstatic, размеры до и после сжатия, ссылки {% static %} без записи в манифесте '
+            'и ресурсы с внешних хостов в шаблонах и CSS. Ошибки — ненулевой код выхода; '
+            'шрифты с Google Fonts — предупреждение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': PIPELINE_STORAGE}}
+            with override_settings(STATIC_ROOT=directory, STORAGES=storages):
+                started = time.perf_counter()
+                call_command('collectstatic', interactive=False, verbosity=0)
+                elapsed = time.perf_counter() - started
+                result = self.inspect(Path(directory), staticfiles_storage.hashed_files)
+        result['collectstatic_seconds'] = elapsed
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            self.report(result)
+        problems = result['missing'] + result['external']
+        if problems:
+            raise CommandError(f'Проблем со статикой: {len(problems)}')
+
+    def inspect(self, root, manifest):
+        sizes = {'files': 0, 'bytes': 0, 'gzip_bytes': 0, 'brotli_bytes': 0}
+        for name in set(manifest.values()):
+            path = root / name
+            size = path.stat().st_size
+            sizes['files'] += 1
+            sizes['bytes'] += size
+            for key, extension in (('gzip_bytes', '.gz'), ('brotli_bytes', '.br')):
+                compressed = path.with_name(path.name + extension)
+                sizes[key] += compressed.stat().st_size if compressed.exists() else size
+
+        missing, external, external_fonts = [], [], []
+        sources = [*Path(apps.get_app_config('core').path, 'templates').rglob('*.html'),
+                   *(root / name for name in manifest.values() if name.endswith('.css'))]
+        for source in sources:
+            text = source.read_text(encoding='utf-8')
+            if source.suffix == '.html':
+                missing.extend(f'{source.name}: {name}' for name in STATIC_TAG.findall(text) if name not in manifest)
+            for url in EXTERNAL_ASSET.findall(text):
+                host = url.split('//', 1)[1].split('/', 1)[0]
+                (external_fonts if host in FONT_HOSTS else external).append(f'{source.name}: {url}')
+        return {**sizes, 'brotli': brotli is not None, 'missing': missing, 'external': external,
+                'external_fonts': external_fonts}
+
+    def report(self, result):
+        self.stdout.write(
+            f"collectstatic {result['collectstatic_seconds']:.2f} с, файлов с хешем {result['files']}, "
+            f"{result['bytes'] / 1024:.0f} КБ; gzip {result['gzip_bytes'] / 1024:.0f} КБ"
+            + (f", brotli {result['brotli_bytes'] / 1024:.0f} КБ" if result['brotli'] else ' (brotli не установлен)')
+        )
+        for problem in result['missing']:
+            self.stdout.write(f'Нет в манифесте: {problem}')
+        for problem in result['external']:
+            self.stdout.write(f'Внешний ресурс: {problem}')
+        for warning in result['external_fonts']:
+            self.stdout.write(f'Шрифт с внешнего хоста: {warning}')
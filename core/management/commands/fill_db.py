@@ -1,97 +1,254 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from multiprocessing import Pool
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
 from core.models import Question, Answer, Tag, Vote, AnswerVote
-import random
-from django.db import models
+from core.ranking import hot_score, refresh_hot_scores
+from core.search import get_backend
+from core.sidebar import invalidate_sidebar
+
+GENERATION_CHUNK = 50_000
+
+
+def random_triples(task):
+    # (индекс слева, индекс справа, ±1) — пары автор/вопрос, пользователь/вопрос и т.п.
+    # Отдельная функция уровня модуля, чтобы её можно было отдать в multiprocessing.Pool.
+    seed, count, left_size, right_size = task
+    rnd = random.Random(seed)
+    return [(rnd.randrange(left_size), rnd.randrange(right_size), rnd.choice((1, -1))) for _ in range(count)]
+
+
+def chunks(sequence, size):
+    for start in range(0, len(sequence), size):
+        yield sequence[start:start + size]
+
 
 class Command(BaseCommand):
     help = 'Fill database with test data'
 
     def add_arguments(self, parser):
         parser.add_argument('ratio', type=int, help='Multiplier for the number of entities')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Число процессов для генерации случайных связей (1 — без multiprocessing)')
+        parser.add_argument('--seed', type=int, default=None, help='Seed для воспроизводимого набора данных')
+
+    @contextmanager
+    def stage(self, title, total=True):
+        # Замер этапа: сколько строк записано и с какой скоростью (total=False — не входит в общий итог).
+        counter = {'rows': 0}
+        started = time.perf_counter()
+        yield counter
+        elapsed = time.perf_counter() - started
+        rate = counter['rows'] / elapsed if elapsed else 0
+        if total:
+            self.total_rows += counter['rows']
+        self.stdout.write(f"{title}: {counter['rows']} строк за {elapsed:.1f} с ({rate:,.0f} строк/с)")
+
+    def generate(self, count, left_size, right_size):
+        tasks = [
+            (self.rnd.randrange(2 ** 32), min(GENERATION_CHUNK, count - start), left_size, right_size)
+            for start in range(0, count, GENERATION_CHUNK)
+        ]
+        if self.workers > 1 and len(tasks) > 1:
+            with Pool(self.workers) as pool:
+                for part in pool.imap(random_triples, tasks):
+                    yield from part
+        else:
+            for task in tasks:
+                yield from random_triples(task)
 
     def handle(self, *args, **options):
         ratio = options['ratio']
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        self.rnd = random.Random(options['seed'])
+        self.total_rows = 0
+        started = time.perf_counter()
+
+        user_ids = self.create_users(ratio)
+        tag_ids = self.create_tags(ratio)
+
+        existing_questions = dict(
+            Question.objects.filter(title__startswith='Question ').values_list('title', 'id')
+        )
+        titles = [f'Question {i}' for i in range(ratio * 10)]
+        new_titles = [title for title in titles if title not in existing_questions]
+        # «Слоты» вопросов: сначала существующие (id известны), затем новые (id появятся после вставки).
+        existing_ids = [existing_questions[title] for title in titles if title in existing_questions]
+        slots = len(existing_ids) + len(new_titles)
+
+        # Все связи генерируются заранее, чтобы рейтинги и счётчики посчитать в памяти
+        # и записать их вместе с самими строками, без SUM + save() по каждой строке.
+        answer_slots = array('l')
+        answer_authors = array('l')
+        answers_per_slot = defaultdict(int)
+        for author, slot, _ in self.generate(ratio * 100, len(user_ids), slots):
+            answer_slots.append(slot)
+            answer_authors.append(author)
+            answers_per_slot[slot] += 1
+
+        question_votes = self.unique_votes(
+            ratio * 200, len(user_ids), slots,
+            existing=self.existing_question_votes(existing_ids, user_ids),
+        )
+        rating_per_slot = defaultdict(int)
+        for _, slot, value in question_votes:
+            rating_per_slot[slot] += value
+
+        answer_votes = self.unique_votes(ratio * 200, len(user_ids), len(answer_slots))
+        answer_rating = array('l', [0]) * len(answer_slots)
+        for _, index, value in answer_votes:
+            answer_rating[index] += value
+
+        question_ids = existing_ids + self.create_questions(
+            new_titles, len(existing_ids), user_ids, tag_ids, rating_per_slot, answers_per_slot,
+        )
+        self.update_existing_questions(existing_ids, rating_per_slot, answers_per_slot)
+
+        answer_ids = self.create_answers(answer_slots, answer_authors, answer_rating, question_ids, user_ids)
+
+        with self.stage('Голоса за вопросы') as counter, transaction.atomic():
+            for part in chunks(question_votes, self.batch_size):
+                counter['rows'] += len(Vote.objects.bulk_create([
+                    Vote(user_id=user_ids[user], question_id=question_ids[slot], value=value)
+                    for user, slot, value in part
+                ], batch_size=self.batch_size))
+
+        with self.stage('Голоса за ответы') as counter, transaction.atomic():
+            for part in chunks(answer_votes, self.batch_size):
+                counter['rows'] += len(AnswerVote.objects.bulk_create([
+                    AnswerVote(user_id=user_ids[user], answer_id=answer_ids[index], value=value)
+                    for user, index, value in part
+                ], batch_size=self.batch_size))
+
+        elapsed = time.perf_counter() - started
+        # Строки поискового индекса — не данные: этап выводится отдельно и в итог не входит.
+        with self.stage('Поисковый индекс', total=False) as counter:
+            counter['rows'] = get_backend().rebuild()
+        invalidate_sidebar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'БД успешно заполнена! {self.total_rows} строк за {elapsed:.1f} с '
+            f'({self.total_rows / elapsed:,.0f} строк/с, без поискового индекса)'
+        ))
+
+    def create_users(self, ratio):
         User = get_user_model()
+        existing = dict(User.objects.filter(username__startswith='user').values_list('username', 'id'))
+        # Хеш пароля дорогой (PBKDF2), поэтому считаем его один раз на всех.
+        password = make_password('pass')
+        with self.stage('Пользователи') as counter, transaction.atomic():
+            missing = [i for i in range(ratio) if f'user{i}' not in existing]
+            for part in chunks(missing, self.batch_size):
+                created = User.objects.bulk_create([
+                    User(username=f'user{i}', email=f'user{i}@test.com', password=password) for i in part
+                ])
+                existing.update((user.username, user.id) for user in created)
+                counter['rows'] += len(created)
+        return [existing[f'user{i}'] for i in range(ratio)]
 
-        users = []
-        for i in range(ratio):
-            username = f'user{i}'
-            email = f'user{i}@test.com'
-            user, created = User.objects.get_or_create(username=username, defaults={'email': email})
-            if created:
-                user.set_password('pass')
-                user.save()
-            users.append(user)
-
-        tags = []
-        for i in range(ratio):
-            tag_title = f'tag{i}'
-            tag, _ = Tag.objects.get_or_create(title=tag_title)
-            tags.append(tag)
-
-        questions = []
-        for i in range(ratio * 10):
-            title = f'Question {i}'
-            detailed = f'Detailed text {i}'
-            author = random.choice(users)
-            question, _ = Question.objects.get_or_create(
-                title=title,
-                defaults={'detailed': detailed, 'author': author}
-            )
-            tag = random.choice(tags)
-            if tag not in question.tags.all():
-                question.tags.add(tag)
-            questions.append(question)
-
-        answers = []
-        for i in range(ratio * 100):
-            question = random.choice(questions)
-            author = random.choice(users)
-            answer_text = f'Answer text {i}'
-            answer, _ = Answer.objects.get_or_create(
-                question=question,
-                author=author,
-                answer_text=answer_text
-            )
-            answers.append(answer)
-
-        existing_votes = set((v.user_id, v.question_id) for v in Vote.objects.all())
-        for _ in range(ratio * 200):
-            user = random.choice(users)
-            question = random.choice(questions)
-            key = (user.id, question.id)
-            if key in existing_votes:
-                continue
-            existing_votes.add(key)
-            Vote.objects.create(
-                user=user,
-                question=question,
-                value=random.choice([1, -1])
-            )
-
-        existing_answer_votes = set((v.user_id, v.answer_id) for v in AnswerVote.objects.all())
-        for _ in range(ratio * 200):
-            user = random.choice(users)
-            answer = random.choice(answers)
-            key = (user.id, answer.id)
-            if key in existing_answer_votes:
+    def create_tags(self, ratio):
+        existing = dict(Tag.objects.filter(title__startswith='tag').values_list('title', 'id'))
+        with self.stage('Теги') as counter, transaction.atomic():
+            missing = [i for i in range(ratio) if f'tag{i}' not in existing]
+            for part in chunks(missing, self.batch_size):
+                created = Tag.objects.bulk_create([Tag(title=f'tag{i}') for i in part])
+                existing.update((tag.title, tag.id) for tag in created)
+                counter['rows'] += len(created)
+        return [existing[f'tag{i}'] for i in range(ratio)]
+
+    def existing_question_votes(self, existing_ids, user_ids):
+        if not existing_ids:
+            return set()
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        slot_index = {question_id: i for i, question_id in enumerate(existing_ids)}
+        return {
+            (user_index[user_id], slot_index[question_id])
+            for user_id, question_id in Vote.objects.values_list('user_id', 'question_id').iterator(chunk_size=10_000)
+            if user_id in user_index and question_id in slot_index
+        }
+
+    def unique_votes(self, count, users, targets, existing=None):
+        seen = existing or set()
+        votes = []
+        for user, target, value in self.generate(count, users, targets):
+            key = (user, target)
+            if key in seen:
                 continue
-            existing_answer_votes.add(key)
-            AnswerVote.objects.create(
-                user=user,
-                answer=answer,
-                value=random.choice([1, -1])
-            )
-
-        for question in questions:
-            total = Vote.objects.filter(question=question).aggregate(total=models.Sum('value'))['total'] or 0
-            question.rating = total
-            question.save()
-
-        for answer in answers:
-            total = AnswerVote.objects.filter(answer=answer).aggregate(total=models.Sum('value'))['total'] or 0
-            answer.rating = total
-            answer.save()
-
-        self.stdout.write(self.style.SUCCESS('БД успешно заполнена!'))
+            seen.add(key)
+            votes.append((user, target, value))
+        return votes
+
+    def create_questions(self, titles, first_slot, user_ids, tag_ids, rating_per_slot, answers_per_slot):
+        Through = Question.tags.through
+        ids = []
+        now = timezone.now()
+        with self.stage('Вопросы и теги вопросов') as counter, transaction.atomic():
+            for offset, part in zip(range(0, len(titles), self.batch_size), chunks(titles, self.batch_size)):
+                questions = []
+                for i, title in enumerate(part):
+                    slot = first_slot + offset + i
+                    rating, answer_count = rating_per_slot[slot], answers_per_slot[slot]
+                    questions.append(Question(
+                        title=title,
+                        slug=slugify(title, allow_unicode=True),
+                        detailed=f"Detailed text {title.split()[-1]}",
+                        author_id=self.rnd.choice(user_ids),
+                        rating=rating,
+                        answer_count=answer_count,
+                        hot_score=hot_score(rating, answer_count, now),
+                    ))
+                created = Question.objects.bulk_create(questions)
+                ids.extend(question.id for question in created)
+                Through.objects.bulk_create([
+                    Through(question_id=question.id, tag_id=self.rnd.choice(tag_ids)) for question in created
+                ], ignore_conflicts=True)
+                counter['rows'] += 2 * len(created)
+        return ids
+
+    def update_existing_questions(self, existing_ids, rating_per_slot, answers_per_slot):
+        # Для уже существующих вопросов — по одному UPDATE ... SET x = x + delta на каждую пару дельт.
+        groups = defaultdict(list)
+        for slot, question_id in enumerate(existing_ids):
+            delta = (rating_per_slot[slot], answers_per_slot[slot])
+            if delta != (0, 0):
+                groups[delta].append(question_id)
+        with self.stage('Обновление существующих вопросов') as counter, transaction.atomic():
+            for (rating, answer_count), ids in groups.items():
+                for part in chunks(ids, 500):
+                    counter['rows'] += Question.objects.filter(id__in=part).update(
+                        rating=F('rating') + rating, answer_count=F('answer_count') + answer_count,
+                        version=F('version') + 1,
+                    )
+            changed = [question_id for ids in groups.values() for question_id in ids]
+            for part in chunks(changed, 500):
+                refresh_hot_scores(Question.objects.filter(id__in=part))
+
+    def create_answers(self, answer_slots, answer_authors, answer_rating, question_ids, user_ids):
+        ids = array('l')
+        with self.stage('Ответы') as counter, transaction.atomic():
+            for start in range(0, len(answer_slots), self.batch_size):
+                created = Answer.objects.bulk_create([
+                    Answer(
+                        question_id=question_ids[answer_slots[i]],
+                        author_id=user_ids[answer_authors[i]],
+                        answer_text=f'Answer text {i}',
+                        rating=answer_rating[i],
+                    )
+                    for i in range(start, min(start + self.batch_size, len(answer_slots)))
+                ])
+                ids.extend(answer.id for answer in created)
+                counter['rows'] += len(created)
+        return ids
@@ -1,30 +1,130 @@
+import random
 import typing as t
+from itertools import islice
+
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
 
-from core.models import Question, User
+from core.models import Question, Answer, Tag, User
+from core.ranking import hot_score
+from core.search import get_backend
+from core.sidebar import invalidate_sidebar
 
 
 FAKE__QUESTION_DETAILED = '''Это подробное описание вопроса. Оно может быть достаточно длинным и содержать много информации, чтобы помочь понять суть вопроса.'''
 
+FAKE__ACTIONS = ['настроить', 'ускорить', 'отладить', 'развернуть', 'протестировать', 'обновить', 'кешировать']
+FAKE__SUBJECTS = ['Django', 'PostgreSQL', 'nginx', 'SQLite', 'Celery', 'Redis', 'gunicorn', 'шаблоны', 'миграции']
+FAKE__CONTEXTS = ['в продакшене', 'под нагрузкой', 'в Docker', 'на Windows', 'для тестов', 'после обновления']
+FAKE__SENTENCES = [
+    'Пробовал разные варианты из документации, но ничего не помогло.',
+    'Ошибка воспроизводится не всегда, примерно в одном запросе из десяти.',
+    'Локально всё работает, а на сервере падает с таймаутом.',
+    'Версии всех пакетов зафиксированы в requirements.txt.',
+    'Буду благодарен за ссылки на статьи или примеры кода.',
+    'Логи ничего подозрительного не показывают.',
+]
+FAKE__ANSWERS = [
+    'Проверьте настройки подключения к базе данных.',
+    'Скорее всего, дело в кеше — попробуйте его сбросить.',
+    'Посмотрите на EXPLAIN запроса, там наверняка нет индекса.',
+    'У меня помогло обновление до последней версии.',
+]
+
+BATCH_SIZE = 1000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
 class Command(BaseCommand):
     help = 'Генерация сущностей по модели Вопроса'
 
     def add_arguments(self, parser):
         parser.add_argument('--count', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--tags', type=int, default=0, help='Сколько существующих тегов (до 3) вешать на вопрос')
+        parser.add_argument('--answers', type=int, default=0, help='Сколько ответов создавать к каждому вопросу')
+        parser.add_argument('--seed', type=int, default=None, help='Seed для воспроизводимого корпуса')
 
     def get_exist_user(self) -> t.Optional[User]:
         return User.objects.filter(is_superuser=True).first()
 
+    def question_stream(self, count, first_number, author, rnd) -> t.Iterator[Question]:
+        # Вопросы создаются лениво, в памяти одновременно живёт только одна пачка.
+        for number in range(first_number, first_number + count):
+            title = (f'Как {rnd.choice(FAKE__ACTIONS)} {rnd.choice(FAKE__SUBJECTS)} '
+                     f'{rnd.choice(FAKE__CONTEXTS)}? (вопрос №{number})')
+            detailed = ' '.join([FAKE__QUESTION_DETAILED, *rnd.sample(FAKE__SENTENCES, rnd.randint(1, 3))])
+            yield Question(
+                title=title,
+                slug=slugify(title, allow_unicode=True),
+                detailed=detailed,
+                author=author,
+            )
+
+    def unique_slugs(self, questions):
+        # Номер в заголовке уже делает slug уникальным; страхуемся от совпадения с существующими,
+        # в том числе с чужими «slug-2»: каждый новый кандидат тоже сверяется с БД.
+        bases = {id(question): question.slug for question in questions}
+        suffixes = dict.fromkeys(bases, 1)
+        taken, pending = set(), list(questions)
+        while pending:
+            taken.update(Question.objects.filter(slug__in=[q.slug for q in pending]).values_list('slug', flat=True))
+            retry = []
+            for question in pending:
+                if question.slug in taken:
+                    suffixes[id(question)] += 1
+                    question.slug = f'{bases[id(question)]}-{suffixes[id(question)]}'
+                    retry.append(question)
+                else:
+                    taken.add(question.slug)
+            pending = retry
+
     def handle(self, *args, **options):
         count = options.get('count')
+        rnd = random.Random(options['seed'])
+        author = self.get_exist_user()
+        if author is None:
+            raise CommandError('Нужен хотя бы один суперпользователь (manage.py createsuperuser)')
+
+        tag_ids = list(Tag.objects.values_list('id', flat=True)) if options['tags'] else []
+        answer_authors = list(User.objects.values_list('id', flat=True)[:1000]) if options['answers'] else []
+        Through = Question.tags.through
         count_exists_questions = Question.objects.all().count()
-        questions_to_create = []
-        for n in range(count):
-            questions_to_create.append(Question(
-                title=f'Вопрос №{count_exists_questions + n + 1}',
-                detailed=FAKE__QUESTION_DETAILED,
-                author=self.get_exist_user(),
-            ))
-
-        Question.objects.bulk_create(questions_to_create, batch_size=100)
-        print("Было создано вопросов:", len(questions_to_create))
\ No newline at end of file
+
+        created = 0
+        stream = self.question_stream(count, count_exists_questions + 1, author, rnd)
+        for batch in batched(stream, options['batch_size']):
+            self.unique_slugs(batch)
+            now = timezone.now()
+            for question in batch:
+                question.answer_count = options['answers']
+                question.hot_score = hot_score(0, question.answer_count, now)
+            with transaction.atomic():
+                Question.objects.bulk_create(batch)
+                if tag_ids:
+                    Through.objects.bulk_create([
+                        Through(question_id=question.id, tag_id=tag_id)
+                        for question in batch
+                        for tag_id in rnd.sample(tag_ids, min(options['tags'], 3, len(tag_ids)))
+                    ], ignore_conflicts=True)
+                if answer_authors:
+                    Answer.objects.bulk_create([
+                        Answer(question_id=question.id, author_id=rnd.choice(answer_authors),
+                               answer_text=rnd.choice(FAKE__ANSWERS))
+                        for question in batch
+                        for _ in range(options['answers'])
+                    ])
+            created += len(batch)
+            self.stderr.write(f'Создано вопросов: {created}/{count}')
+
+        get_backend().rebuild()
+        if tag_ids:
+            invalidate_sidebar()
+        self.stdout.write(f'Было создано вопросов: {created}')
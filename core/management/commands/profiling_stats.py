@@ -0,0 +1,45 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import summarize
+
+
+class Command(BaseCommand):
+    help = 'Перцентили p50/p95/p99 времени ответа по имени URL из журнала PROFILING_LOG_FILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Путь к журналу (по умолчанию PROFILING_LOG_FILE)')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.PROFILING_LOG_FILE
+        if not path:
+            raise CommandError('Журнал не задан: укажите --file или [profiling] LOG_FILE в conf/local.conf')
+
+        durations = defaultdict(list)
+        queries = defaultdict(list)
+        try:
+            with open(path, encoding='utf-8') as log:
+                for line in log:
+                    record = json.loads(line)
+                    durations[record['url_name']].append(record['total_ms'])
+                    queries[record['url_name']].append(record['queries'])
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден')
+
+        summary = summarize(durations)
+        for url_name, row in summary.items():
+            row['avg_queries'] = sum(queries[url_name]) / len(queries[url_name])
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+        self.stdout.write(f"{'url':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for url_name, row in sorted(summary.items()):
+            self.stdout.write(
+                f"{url_name:<20}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                f"{row['p99_ms']:>10.1f}{row['avg_queries']:>10.1f}"
+            )
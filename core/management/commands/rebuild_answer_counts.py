@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Question, Answer
+
+
+def actual_answer_count():
+    counts = (
+        Answer.objects.filter(question=OuterRef('pk'))
+        .order_by()
+        .values('question')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт (или проверка) денормализованного Question.answer_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить счётчики, ничего не изменяя')
+
+    def handle(self, *args, **options):
+        drifted = (
+            Question.objects.annotate(actual=actual_answer_count())
+            .exclude(answer_count=F('actual'))
+        )
+        drifted_count = drifted.count()
+
+        if options['check']:
+            if drifted_count:
+                for question_id, stored, actual in drifted.values_list('id', 'answer_count', 'actual')[:20]:
+                    self.stdout.write(f'Вопрос {question_id}: answer_count={stored}, на самом деле {actual}')
+                raise CommandError(f'Расходится счётчиков: {drifted_count}')
+            self.stdout.write(self.style.SUCCESS('Все счётчики ответов корректны'))
+            return
+
+        # Только расходящиеся вопросы: им поднимается версия, чтобы сбросить закешированные карточки.
+        with transaction.atomic():
+            updated = Question.objects.filter(pk__in=drifted.values('pk')).update(
+                answer_count=actual_answer_count(), version=F('version') + 1,
+            )
+        self.stdout.write(self.style.SUCCESS(f'Исправлено расхождений: {updated}'))
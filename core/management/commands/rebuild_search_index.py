@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Полная перестройка поискового индекса по вопросам и ответам (после bulk-загрузки данных)'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс {type(backend).__name__} перестроен, документов: {indexed}'
+        ))
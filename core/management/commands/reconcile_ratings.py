@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Question, Answer, Vote, AnswerVote
+
+
+def actual_rating(vote_model, target_field):
+    totals = (
+        vote_model.objects.filter(**{target_field: OuterRef('pk')})
+        .order_by()
+        .values(target_field)
+        .annotate(total=Sum('value'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Сверка рейтингов вопросов и ответов с таблицами голосов (Vote/AnswerVote)'
+
+    TARGETS = (
+        (Question, Vote, 'question'),
+        (Answer, AnswerVote, 'answer'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только найти расхождения, ничего не изменяя')
+
+    def handle(self, *args, **options):
+        total_drifted = 0
+        for model, vote_model, target_field in self.TARGETS:
+            name = model._meta.verbose_name_plural
+            drifted = (
+                model.objects.annotate(actual=actual_rating(vote_model, target_field))
+                .exclude(rating=F('actual'))
+            )
+            drifted_count = drifted.count()
+            total_drifted += drifted_count
+
+            if options['check']:
+                for pk, stored, actual in drifted.values_list('pk', 'rating', 'actual')[:20]:
+                    self.stdout.write(f'{name} {pk}: rating={stored}, по голосам {actual}')
+                continue
+
+            # Карточки вопросов кешируются по версии — исправленный рейтинг должен её поднять.
+            extra = {'version': F('version') + 1} if model is Question else {}
+            with transaction.atomic():
+                model.objects.filter(pk__in=drifted.values('pk')).update(
+                    rating=actual_rating(vote_model, target_field), **extra
+                )
+            self.stdout.write(f'{name}: исправлено расхождений {drifted_count}')
+
+        if options['check'] and total_drifted:
+            raise CommandError(f'Расходится рейтингов: {total_drifted}')
+        self.stdout.write(self.style.SUCCESS('Рейтинги согласованы с голосами'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Question
+from core.ranking import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт hot_score вопросов (после массовой загрузки данных или изменения формулы)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--active-only', action='store_true', help='Только активные вопросы')
+
+    def handle(self, *args, **options):
+        queryset = Question.objects.active() if options['active_only'] else Question.objects.all()
+        updated = refresh_hot_scores(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано вопросов: {updated}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.sidebar import refresh_sidebar
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт кеша сайдбара (популярные теги и лучшие пользователи); удобно запускать по cron'
+
+    def handle(self, *args, **options):
+        context = refresh_sidebar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Сайдбар обновлён: тегов {len(context['tags'])}, пользователей {len(context['best_users'])}"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.26 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_answer_count(apps, schema_editor):
+    Question = apps.get_model('core', 'Question')
+    Answer = apps.get_model('core', 'Answer')
+    counts = (
+        Answer.objects.filter(question=OuterRef('pk'))
+        .order_by()
+        .values('question')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Question.objects.update(answer_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_answer_is_correct_answer_rating_question_rating_vote_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answer_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Число ответов'),
+        ),
+        migrations.RunPython(fill_answer_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.26 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    # Перед уникальным индексом на Tag.title сливаем одноимённые теги в самый ранний.
+    Tag = apps.get_model('core', 'Tag')
+    Question = apps.get_model('core', 'Question')
+    duplicates = (
+        Tag.objects.values('title')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        extra = Tag.objects.filter(title=row['title']).exclude(id=row['first_id'])
+        for question in Question.objects.filter(tags__in=extra).distinct():
+            question.tags.add(row['first_id'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_question_answer_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='question',
+            name='answer_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число ответов'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='title',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название тега'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-rating', '-created_at'], name='answer_question_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='question_active_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-rating', '-id'], name='question_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['answer_count', 'created_at', 'id'], name='question_active_answers_idx'),
+        ),
+    ]
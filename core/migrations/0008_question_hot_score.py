@@ -0,0 +1,52 @@
+# Generated by Django 4.2.26 on 2026-10-18 07:45
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def hot_score(rating, answer_count, created_at):
+    # Копия формулы core.ranking на момент миграции: миграция не должна зависеть от текущего кода.
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    activity = rating + 2 * answer_count
+    order = math.log10(max(abs(activity), 1))
+    sign = (activity > 0) - (activity < 0)
+    seconds = (created_at or epoch).timestamp() - epoch.timestamp()
+    return round(sign * order + seconds / 45000, 7)
+
+
+def fill_hot_score(apps, schema_editor):
+    Question = apps.get_model('core', 'Question')
+    batch = []
+    questions = Question.objects.only('id', 'rating', 'answer_count', 'created_at')
+    for question in questions.iterator(chunk_size=BATCH_SIZE):
+        question.hot_score = hot_score(question.rating, question.answer_count, question.created_at)
+        batch.append(question)
+        if len(batch) >= BATCH_SIZE:
+            Question.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    if batch:
+        Question.objects.bulk_update(batch, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Горячесть'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-hot_score', '-id'], name='question_active_hot_idx'),
+        ),
+        migrations.RunPython(fill_hot_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Таблица полнотекстового индекса для core.search.SQLiteFTSBackend (только SQLite).
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS core_search_index USING fts5("
+        "title, body, question_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, body, question_id) "
+        "SELECT 2 * id, title, detailed, id FROM core_question"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, body, question_id) "
+        "SELECT 2 * id + 1, '', answer_text, question_id FROM core_answer"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS core_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_question_hot_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -2,7 +2,8 @@ from django.contrib.auth.base_user import AbstractBaseUser
 from django.db import models
 from django.contrib.auth.models import User, AbstractUser
 from django.utils.text import slugify
-from PIL import Image
+
+from core.avatars import schedule_avatar_processing, variant_name
 
 
 class DefaultModel(models.Model):
@@ -16,32 +17,73 @@ class DefaultModel(models.Model):
 
 class User(AbstractUser):
     avatar = models.ImageField(upload_to='avatars', null=True, blank=True)
+    # Хеш содержимого аватара; по нему строятся имена готовых превью (см. core/avatars.py).
+    avatar_hash = models.CharField(max_length=16, blank=True, default='', editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_avatar = self.avatar.name if self.avatar else ''
+        # Имя из БД: при переименовании сбрасываются карточки вопросов и сайдбар (core/signals.py).
+        self._saved_username = self.__dict__.get('username')
 
     def save(self, *args, **kwargs):
+        avatar_changed = (self.avatar.name if self.avatar else '') != self._saved_avatar
+        if avatar_changed:
+            self.avatar_hash = ''
         super().save(*args, **kwargs)
 
-        if self.avatar:
-            img_path = self.avatar.path
-            img = Image.open(img_path)
+        # Ресайз идёт в фоне и только при смене файла, а не на каждое сохранение профиля.
+        if avatar_changed and self.avatar:
+            schedule_avatar_processing(self)
+        self._saved_avatar = self.avatar.name if self.avatar else ''
+        self._saved_username = self.username
 
-            max_size = (50, 50)
-            img.thumbnail(max_size, Image.LANCZOS)
+    def _avatar_variant_url(self, size, ext):
+        if not self.avatar:
+            return ''
+        if not self.avatar_hash:
+            return self.avatar.url
+        return self.avatar.storage.url(variant_name(self.avatar_hash, size, ext))
 
-            if img.format == 'JPEG' or img.format == 'JPG':
-                img.save(img_path, format='JPEG', quality=85)
-            else:
-                img.save(img_path)
+    @property
+    def avatar_small_url(self):
+        return self._avatar_variant_url(50, 'jpg')
+
+    @property
+    def avatar_small_webp_url(self):
+        return self._avatar_variant_url(50, 'webp')
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
 
+class QuestionQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+    def for_listing(self):
+        # Всё, что нужно карточке вопроса в списках, за постоянное число запросов:
+        # автор через JOIN, теги одним prefetch-запросом (число ответов хранится в answer_count).
+        return self.select_related('author').prefetch_related('tags')
+
+
 # Описание таблиц в БД.
 class Question(DefaultModel):
     class Meta:
         verbose_name = 'Вопрос'
         verbose_name_plural = 'Вопросы'
+        # Частичные индексы под сортировки списков (списки показывают только активные вопросы).
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='question_active_new_idx'),
+            models.Index(fields=['-rating', '-id'], condition=models.Q(is_active=True),
+                         name='question_active_rating_idx'),
+            models.Index(fields=['answer_count', 'created_at', 'id'], condition=models.Q(is_active=True),
+                         name='question_active_answers_idx'),
+            models.Index(fields=['-hot_score', '-id'], condition=models.Q(is_active=True),
+                         name='question_active_hot_idx'),
+        ]
 
     slug = models.SlugField(max_length=200, unique=True, null=True, blank=True)
     title = models.CharField(max_length=200)
@@ -49,19 +91,37 @@ class Question(DefaultModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     tags = models.ManyToManyField('Tag', blank=True, verbose_name='Теги')
     rating = models.IntegerField(default=0, verbose_name="Рейтинг")
+    # Денормализованный счётчик ответов, поддерживается сигналами в core/signals.py.
+    answer_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Число ответов")
+    # Рейтинг для страницы «горячих» вопросов, см. core/ranking.py.
+    hot_score = models.FloatField(default=0, editable=False, verbose_name="Горячесть")
+    # Растёт при любом изменении, видимом в карточке вопроса (ключ фрагментного кеша).
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
 
     def __str__(self):
         return str(self.title)
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title, allow_unicode=True)
-        return super(Question, self).save(*args, **kwargs)
+        if self.pk is None:
+            return super(Question, self).save(*args, **kwargs)
+        # F(), а не += 1: версию могли поднять голоса, пока объект был загружен.
+        self.version = models.F('version') + 1
+        result = super(Question, self).save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+        return result
 
 
 class Answer(DefaultModel):
     class Meta:
         verbose_name = 'Ответ'
         verbose_name_plural = 'Ответы'
+        # Ответы на странице вопроса: WHERE question_id = ? ORDER BY rating DESC, created_at DESC.
+        indexes = [
+            models.Index(fields=['question', '-rating', '-created_at'], name='answer_question_rating_idx'),
+        ]
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -91,7 +151,7 @@ class Tag(models.Model):
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
 
-    title = models.CharField(max_length=200, verbose_name="Название тега")
+    title = models.CharField(max_length=200, unique=True, verbose_name="Название тега")
 
     def __str__(self):
         return str(self.title)
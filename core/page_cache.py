@@ -0,0 +1,207 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+
+from core.profiling import record_cache, record_template
+from core.sidebar import SIDEBAR_CACHE_KEY, sidebar_context
+
+# Параметры запроса, от которых зависит содержимое кешируемых страниц; остальные в ключ не входят.
+PAGE_CACHE_PARAMS = ('sort', 'tag', 'page', 'after', 'before')
+LISTS_GENERATION = 'lists'
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _generation_key(name):
+    return f'pagecache:gen:{name}'
+
+
+def question_generation(question_id):
+    return f'question:{question_id}'
+
+
+def bump_generations(*names):
+    # Страницы не удаляются по одной: меняется «поколение», и все ключи со старым поколением
+    # перестают использоваться (их вытеснит TTL). Поколение — время изменения в наносекундах:
+    # оно же даёт Last-Modified и не повторяется после очистки кеша, в отличие от счётчика.
+    now = time.time_ns()
+    cache.set_many({_generation_key(name): now for name in names}, None)
+
+
+def _generations(names):
+    keys = [_generation_key(name) for name in names]
+    stored = cache.get_many(keys)
+    missing = [key for key in keys if key not in stored]
+    if missing:
+        # Поколение неизвестно (холодный кеш): считаем, что страница изменилась сейчас.
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        stored.update(cache.get_many(missing))
+    return [stored[key] for key in keys]
+
+
+def invalidate_question_pages(question_id):
+    """Сбрасывает кеш страницы вопроса и всех списков (в них видны рейтинг и число ответов)."""
+    bump_generations(LISTS_GENERATION, question_generation(question_id))
+
+
+def invalidate_question_page(question_id):
+    """Сбрасывает кеш только страницы вопроса: рейтинг ответов в списках не виден."""
+    bump_generations(question_generation(question_id))
+
+
+def invalidate_list_pages():
+    bump_generations(LISTS_GENERATION)
+
+
+def _page_key(request, generations):
+    version = '.'.join(str(value) for value in _generations(generations))
+    params = urlencode(sorted(
+        (name, request.GET[name]) for name in PAGE_CACHE_PARAMS if name in request.GET
+    ))
+    return f'pagecache:page:{version}:{request.path}?{params}'
+
+
+def _cacheable(request):
+    return request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+
+
+def _validators(request, versions, built_at):
+    """ETag и Last-Modified страницы без рендера: по поколениям страницы и времени сборки её сайдбара."""
+    source = f"{request.get_full_path()}:{'.'.join(map(str, versions))}:{built_at}"
+    etag = quote_etag(hashlib.md5(source.encode(), usedforsecurity=False).hexdigest())
+    last_modified = int(max(max(versions) / 1e9, built_at))
+    # Last-Modified с точностью до секунды: пока идёт секунда последнего изменения, в ней возможны
+    # ещё правки, и клиент с одним If-Modified-Since получил бы ложный 304. Тогда отдаём только ETag.
+    if last_modified >= int(time.time()):
+        last_modified = None
+    return etag, last_modified
+
+
+def _rendered_sidebar():
+    # Время сборки сайдбара, с которым только что отрисована страница (view взял его из кеша).
+    return (cache.get(SIDEBAR_CACHE_KEY) or {}).get('built_at')
+
+
+def _set_validators(response, validators):
+    etag, last_modified = validators
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит страницу, но каждый раз сверяется с сервером (дешёвый 304), а не угадывает свежесть.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _build(entry, state):
+    record_cache(hits=1)
+    content, content_type = entry[:2]
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = state
+    # Копия могла быть собрана со старым сайдбаром: валидаторы должны описывать именно её.
+    response.sidebar_built_at = entry[3] if len(entry) > 3 else None
+    return response
+
+
+def cache_anonymous_page(generations):
+    """Кеш целых страниц и условные GET (ETag/Last-Modified, 304) для анонимных GET-запросов.
+
+    generations(kwargs) возвращает имена поколений, от которых зависит страница.
+    Запись живёт PAGE_CACHE_TIMEOUT секунд «свежей» и ещё PAGE_CACHE_STALE_TIMEOUT — устаревшей:
+    пока один запрос перестраивает страницу под блокировкой, остальные получают устаревшую копию.
+    Для холодного ключа остальные запросы ждут до LOCK_WAIT секунд, а не рендерят страницу параллельно.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            # Асинхронная страница: логика кеша с блокировкой и ожиданием остаётся синхронной
+            # и выполняется в потоке, а сама страница строится в цикле событий.
+            sync_wrapper = decorator(async_to_sync(view))
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                return await sync_to_async(sync_wrapper)(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+            names = generations(kwargs)
+            if not settings.CONDITIONAL_PAGES:
+                return cached_view(request, names, *args, **kwargs)
+
+            # К БД здесь обращается только пересборка сайдбара, когда его нет в кеше (она всё равно нужна странице).
+            built_at = sidebar_context().get('built_at')
+            versions = _generations(names)
+            if built_at is not None:
+                validators = _validators(request, versions, built_at)
+                not_modified = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+                if not_modified is not None:
+                    record_cache(hits=1)
+                    return _set_validators(not_modified, validators)
+
+            response = cached_view(request, names, *args, **kwargs)
+            rendered_with = getattr(response, 'sidebar_built_at', built_at)
+            if response.status_code == 200 and rendered_with is not None:
+                _set_validators(response, _validators(request, versions, rendered_with))
+            return response
+
+        def cached_view(request, names, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if not timeout:
+                return view(request, *args, **kwargs)
+
+            key = _page_key(request, names)
+            lock_key = f'{key}:lock'
+            entry = cache.get(key)
+            if entry is not None:
+                if entry[2] > time.time():
+                    return _build(entry, 'HIT')
+                if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                    return _build(entry, 'STALE')
+            elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return _build(entry, 'HIT')
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    # Страница рендерится здесь, а не в обработчике: post-render callback профилировщика
+                    # её уже не увидит, поэтому время рендера учитывается отдельно.
+                    render_started = time.perf_counter()
+                    response = response.render()
+                    record_template(time.perf_counter() - render_started)
+                response.sidebar_built_at = _rendered_sidebar()
+                if response.status_code == 200 and not response.cookies and not response.streaming:
+                    entry = (response.content, response['Content-Type'], time.time() + timeout,
+                             response.sidebar_built_at)
+                    cache.set(key, entry, timeout + settings.PAGE_CACHE_STALE_TIMEOUT)
+                response['X-Page-Cache'] = 'MISS'
+                record_cache(misses=1)
+                return response
+            finally:
+                cache.delete(lock_key)
+        return wrapper
+    return decorator
+
+
+def list_page_generations(kwargs):
+    return [LISTS_GENERATION]
+
+
+def question_page_generations(kwargs):
+    return [question_generation(kwargs['id'])]
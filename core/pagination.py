@@ -0,0 +1,172 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def paginate(objects_list, request, per_page=10):
+    paginator = Paginator(objects_list, per_page)
+    page_number = request.GET.get('page', 1)
+    try:
+        page = paginator.get_page(page_number)
+    except PageNotAnInteger:
+        page = paginator.get_page(1)
+    except EmptyPage:
+        page = paginator.get_page(paginator.num_pages)
+    return page
+
+
+def page_links(page):
+    # Номера страниц со сжатием середины («1 2 … 9 10 11 … 499 500») вместо полного page_range.
+    if getattr(page, 'is_cursor', False):
+        return []
+    return page.paginator.get_elided_page_range(page.number)
+
+
+def paginate_listing(queryset, request, per_page, ordering, mode=None):
+    """Страница списка в режиме settings.PAGINATION_MODE (или переданном mode): 'pages' или 'cursor'."""
+    mode = mode or settings.PAGINATION_MODE
+    if mode == 'cursor':
+        return cursor_paginate(queryset, request, per_page, ordering)
+    return paginate(queryset.order_by(*ordering), request, per_page)
+
+
+def _field_names(ordering):
+    return [field.lstrip('-') for field in ordering]
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а keyset_filter сравнивает строго:
+    # строки с теми же миллисекундами, но другими микросекундами выпали бы на границе страниц.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(obj, ordering):
+    values = [getattr(obj, name) for name in _field_names(ordering)]
+    raw = json.dumps(values, cls=_CursorEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Значения ключа из курсора или None, если курсор битый."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        names = _field_names(ordering)
+        if not isinstance(values, list) or len(values) != len(names):
+            return None
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(names, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def keyset_filter(ordering, values, backwards=False):
+    # (a, b) < (a0, b0) для ORDER BY a DESC, b DESC раскрывается в
+    # a <= a0 AND (a < a0 OR (a = a0 AND b < b0)); первое условие даёт БД диапазон по индексу.
+    names = _field_names(ordering)
+    condition = Q()
+    for i, field in enumerate(ordering):
+        descending = field.startswith('-') != backwards
+        step = Q(**{f"{names[i]}__{'lt' if descending else 'gt'}": values[i]})
+        for j in range(i):
+            step &= Q(**{names[j]: values[j]})
+        condition |= step
+    first_descending = ordering[0].startswith('-') != backwards
+    bound = Q(**{f"{names[0]}__{'lte' if first_descending else 'gte'}": values[0]})
+    return bound & condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class CursorPage:
+    """Страница keyset-пагинации: без OFFSET и без COUNT(*) на каждый запрос, только «назад/вперёд»."""
+    is_cursor = True
+
+    def __init__(self, object_list, queryset, request, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.queryset = queryset
+        self.request = request
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url(self, **params):
+        query = self.request.GET.copy()
+        for key in ('after', 'before', 'page'):
+            query.pop(key, None)
+        query.update(params)
+        return f'?{query.urlencode()}'
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor)
+
+    @property
+    def previous_url(self):
+        return self._url(before=self.previous_cursor)
+
+    @property
+    def total(self):
+        # Общее число строк — из кеша, пересчитывается не чаще раза в COUNT_CACHE_TIMEOUT секунд.
+        key = 'pagination-count:' + hashlib.md5(str(self.queryset.order_by().query).encode()).hexdigest()
+        return cache.get_or_set(key, self.queryset.count, COUNT_CACHE_TIMEOUT)
+
+
+def cursor_paginate(queryset, request, per_page, ordering):
+    """Keyset-пагинация по ordering (последнее поле должно быть уникальным, например id)."""
+    model = queryset.model
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    after_values = decode_cursor(after, model, ordering) if after else None
+    before_values = decode_cursor(before, model, ordering) if before else None
+
+    if before_values is not None:
+        rows = list(
+            queryset.filter(keyset_filter(ordering, before_values, backwards=True))
+            .order_by(*_reverse_ordering(ordering))[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_next = True
+    else:
+        page_qs = queryset.order_by(*ordering)
+        if after_values is not None:
+            page_qs = page_qs.filter(keyset_filter(ordering, after_values))
+        rows = list(page_qs[:per_page + 1])
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_previous = after_values is not None
+
+    return CursorPage(
+        items, queryset, request,
+        next_cursor=encode_cursor(items[-1], ordering) if has_next and items else None,
+        previous_cursor=encode_cursor(items[0], ordering) if has_previous and items else None,
+    )
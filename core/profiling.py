@@ -0,0 +1,198 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних запросов на каждый URL держать в памяти для перцентилей.
+STATS_WINDOW = 1000
+
+_current = ContextVar('request_profile', default=None)
+_stats_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries = Counter()
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Запросы асинхронной страницы идут из нескольких потоков одновременно.
+        self._lock = threading.Lock()
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.queries.values() if count > 1)
+
+    def record_query(self, sql, duration):
+        # Текст без параметров одинаковый у запросов N+1, по нему и ищем дубликаты.
+        with self._lock:
+            self.query_time += duration
+            self.query_count += 1
+            self.queries[sql] += 1
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    # Профиль берётся из ContextVar, а не передаётся в обёртку: контекст копируется
+    # в потоки sync_to_async, и запросы асинхронных страниц тоже попадают в свой профиль.
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - started)
+
+
+def instrument(connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+connection_created.connect(instrument)
+
+
+def record_cache(hits=0, misses=0):
+    """Учёт попаданий в кеш из наших слоёв кеширования (страницы, карточки, сайдбар)."""
+    profile = _current.get()
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+def record_template(duration):
+    """Время рендера шаблона, отрисованного в обход TemplateResponse middleware (например, в кеше страниц)."""
+    profile = _current.get()
+    if profile is not None:
+        with profile._lock:
+            profile.template_time += duration
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(durations_by_url):
+    summary = {}
+    for url_name, durations in durations_by_url.items():
+        values = sorted(durations)
+        summary[url_name] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 0.50),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+        }
+    return summary
+
+
+def request_stats():
+    """Перцентили времени ответа по имени URL для текущего процесса."""
+    with _stats_lock:
+        snapshot = {name: list(values) for name, values in _durations.items()}
+    return summarize(snapshot)
+
+
+def reset_request_stats():
+    with _stats_lock:
+        _durations.clear()
+
+
+class RequestProfilingMiddleware:
+    """Время запроса, SQL (число, время, дубликаты), рендер шаблона и кеш — в заголовке Server-Timing."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        # Соединения, открытые до загрузки модуля (например, в тестах), сигнал connection_created пропустил.
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match and match.url_name else 'unresolved'
+        self.record(request, response, url_name, profile, total_ms)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = _current.get()
+        if profile is not None:
+            render_started = time.perf_counter()
+
+            def rendered(response):
+                with profile._lock:
+                    profile.template_time += time.perf_counter() - render_started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, url_name, profile, total_ms):
+        with _stats_lock:
+            _durations[url_name].append(total_ms)
+
+        if profile.duplicate_queries >= settings.PROFILING_DUPLICATE_THRESHOLD:
+            sql, count = profile.queries.most_common(1)[0]
+            logger.warning('%s %s: %d повторных SQL-запросов (возможен N+1), чаще всего x%d: %s',
+                           request.method, request.path, profile.duplicate_queries, count, sql)
+
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total_ms:.1f}',
+                f'db;dur={profile.query_time * 1000:.1f};desc="{profile.query_count} queries, '
+                f'{profile.duplicate_queries} duplicates"',
+                f'tpl;dur={profile.template_time * 1000:.1f}',
+                f'cache;desc="{profile.cache_hits} hits, {profile.cache_misses} misses"',
+            ])
+
+        if settings.PROFILING_LOG_FILE:
+            line = json.dumps({
+                'url_name': url_name, 'method': request.method, 'status': response.status_code,
+                'total_ms': round(total_ms, 3), 'db_ms': round(profile.query_time * 1000, 3),
+                'queries': profile.query_count, 'duplicates': profile.duplicate_queries,
+                'template_ms': round(profile.template_time * 1000, 3),
+                'cache_hits': profile.cache_hits, 'cache_misses': profile.cache_misses,
+            })
+            with _stats_lock, open(settings.PROFILING_LOG_FILE, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
@@ -0,0 +1,42 @@
+import math
+from datetime import datetime, timezone
+
+from core.models import Question
+
+# Вес ответа относительно одного голоса.
+ANSWER_WEIGHT = 2
+# За каждые HOT_HALF_LIFE секунд «свежести» вопрос получает столько же, сколько за 10x активности.
+HOT_HALF_LIFE = 45000
+HOT_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+BATCH_SIZE = 1000
+
+
+def hot_score(rating, answer_count, created_at):
+    # Затухание по возрасту выражено через бонус за время создания: порядок вопросов
+    # тот же, что у «активность / возраст», но значение не нужно пересчитывать с течением времени —
+    # только при изменении рейтинга или числа ответов.
+    activity = rating + ANSWER_WEIGHT * answer_count
+    order = math.log10(max(abs(activity), 1))
+    sign = (activity > 0) - (activity < 0)
+    seconds = (created_at or HOT_EPOCH).timestamp() - HOT_EPOCH.timestamp()
+    return round(sign * order + seconds / HOT_HALF_LIFE, 7)
+
+
+def refresh_hot_scores(queryset=None):
+    """Пересчитывает hot_score пачками по BATCH_SIZE; возвращает число обновлённых вопросов."""
+    queryset = Question.objects.all() if queryset is None else queryset
+    updated = 0
+    batch = []
+    for question in queryset.only('id', 'rating', 'answer_count', 'created_at').iterator(chunk_size=BATCH_SIZE):
+        question.hot_score = hot_score(question.rating, question.answer_count, question.created_at)
+        batch.append(question)
+        if len(batch) >= BATCH_SIZE:
+            updated += Question.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    if batch:
+        updated += Question.objects.bulk_update(batch, ['hot_score'])
+    return updated
+
+
+def refresh_hot_score(question_id):
+    return refresh_hot_scores(Question.objects.filter(pk=question_id))
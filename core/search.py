@@ -0,0 +1,146 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from core.models import Question, Answer
+
+SEARCH_RESULTS_LIMIT = 1000
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchBackend:
+    """Интерфейс поискового движка: индексация вопросов/ответов и ранжированный поиск вопросов."""
+
+    def index_question(self, question):
+        pass
+
+    def index_answer(self, answer):
+        pass
+
+    def remove_question(self, question_id):
+        pass
+
+    def remove_answer(self, answer_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        """Список id вопросов, от самых релевантных."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    # Запасной вариант для БД без полнотекстового индекса: LIKE по полям, порядок по рейтингу.
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        words = WORD_RE.findall(query)
+        if not words:
+            return []
+        condition = Q()
+        for word in words:
+            condition &= (Q(title__icontains=word) | Q(detailed__icontains=word)
+                          | Q(answer__answer_text__icontains=word))
+        return list(
+            Question.objects.active().filter(condition)
+            .order_by('-rating', '-id').values_list('id', flat=True).distinct()[:limit]
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс SQLite FTS5 (таблица создаётся миграцией 0009_search_index).
+
+    Вопрос хранится в строке rowid = 2 * id, ответ — в строке rowid = 2 * id + 1,
+    так что обновление и удаление идут по первичному ключу индекса.
+    """
+    TABLE = 'core_search_index'
+    # Веса bm25 для колонок title, body (остальные колонки не индексируются).
+    TITLE_WEIGHT = 10.0
+    BODY_WEIGHT = 1.0
+
+    def _upsert(self, rowid, question_id, title, body):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {self.TABLE} (rowid, title, body, question_id) VALUES (%s, %s, %s, %s)',
+                [rowid, title, body, question_id],
+            )
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.TABLE} WHERE rowid = %s', [rowid])
+
+    def index_question(self, question):
+        self._upsert(2 * question.id, question.id, question.title, question.detailed)
+
+    def index_answer(self, answer):
+        self._upsert(2 * answer.id + 1, answer.question_id, '', answer.answer_text)
+
+    def remove_question(self, question_id):
+        self._delete(2 * question_id)
+
+    def remove_answer(self, answer_id):
+        self._delete(2 * answer_id + 1)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.TABLE}')
+            cursor.execute(
+                f'INSERT INTO {self.TABLE} (rowid, title, body, question_id) '
+                f'SELECT 2 * id, title, detailed, id FROM {Question._meta.db_table}'
+            )
+            cursor.execute(
+                f'INSERT INTO {self.TABLE} (rowid, title, body, question_id) '
+                f"SELECT 2 * id + 1, '', answer_text, question_id FROM {Answer._meta.db_table}"
+            )
+            cursor.execute(f"INSERT INTO {self.TABLE} ({self.TABLE}) VALUES ('optimize')")
+            cursor.execute(f'SELECT COUNT(*) FROM {self.TABLE}')
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def match_expression(query):
+        # Пользовательский ввод не передаём в синтаксис FTS5 как есть: каждое слово — фраза с префиксным поиском.
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            # bm25 считается по каждому документу (вопрос или ответ), вопрос ранжируется по лучшему из них.
+            # LIMIT -1 не даёт SQLite «развернуть» подзапрос: bm25 нельзя вызывать внутри агрегата.
+            cursor.execute(
+                f'SELECT m.question_id FROM ('
+                f'  SELECT question_id, bm25({self.TABLE}, %s, %s) AS score'
+                f'  FROM {self.TABLE} WHERE {self.TABLE} MATCH %s LIMIT -1'
+                f') m JOIN {Question._meta.db_table} q ON q.id = m.question_id '
+                f'WHERE q.is_active '
+                f'GROUP BY m.question_id '
+                f'ORDER BY MIN(m.score), m.question_id DESC '
+                f'LIMIT %s',
+                [self.TITLE_WEIGHT, self.BODY_WEIGHT, expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = settings.SEARCH_BACKEND
+        if not path:
+            path = ('core.search.SQLiteFTSBackend' if connection.vendor == 'sqlite'
+                    else 'core.search.DatabaseSearchBackend')
+        _backend = import_string(path)()
+    return _backend
+
+
+def search_questions(query, limit=SEARCH_RESULTS_LIMIT):
+    return get_backend().search(query, limit)
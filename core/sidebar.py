@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Question, Answer, Tag
+from core.profiling import record_cache
+
+SIDEBAR_CACHE_KEY = 'core:sidebar'
+POPULAR_TAGS_LIMIT = 20
+BEST_USERS_LIMIT = 5
+
+
+def _rating_sum(model):
+    totals = (
+        model.objects.filter(author=OuterRef('pk'))
+        .order_by()
+        .values('author')
+        .annotate(total=Sum('rating'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=IntegerField()), Value(0))
+
+
+def popular_tags(limit=POPULAR_TAGS_LIMIT):
+    return list(
+        Tag.objects.annotate(usage=Count('question'))
+        .filter(usage__gt=0)
+        .order_by('-usage', 'title')
+        .values('title', 'usage')[:limit]
+    )
+
+
+def best_users(limit=BEST_USERS_LIMIT):
+    # Суммарный рейтинг вопросов и ответов автора.
+    User = get_user_model()
+    return list(
+        User.objects.annotate(total_rating=_rating_sum(Question) + _rating_sum(Answer))
+        .order_by('-total_rating', 'id')
+        .values('username', 'total_rating')[:limit]
+    )
+
+
+def refresh_sidebar():
+    context = {'tags': popular_tags(), 'best_users': best_users(), 'built_at': time.time()}
+    cache.set(SIDEBAR_CACHE_KEY, context, settings.SIDEBAR_CACHE_TIMEOUT)
+    return context
+
+
+def sidebar_context():
+    """Контекст сайдбара из кеша; пересчитывается по истечении SIDEBAR_CACHE_TIMEOUT или после сброса."""
+    context = cache.get(SIDEBAR_CACHE_KEY)
+    if context is None:
+        record_cache(misses=1)
+        context = refresh_sidebar()
+    else:
+        record_cache(hits=1)
+    return context
+
+
+def invalidate_sidebar():
+    cache.delete(SIDEBAR_CACHE_KEY)
@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.auth_cache import invalidate_user
+from core.models import User, Question, Answer, Tag
+from core.page_cache import invalidate_question_pages, invalidate_list_pages
+from core.ranking import hot_score, refresh_hot_score
+from core.search import get_backend
+from core.sidebar import invalidate_sidebar
+from core.tag_index import index as tag_index
+
+
+# Инкрементальное обновление Question.answer_count: срабатывает и во views, и в админке,
+# и при каскадном/массовом удалении (queryset.delete() тоже шлёт post_delete).
+@receiver(post_save, sender=Answer)
+def answer_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Question.objects.filter(pk=instance.question_id).update(
+            answer_count=F('answer_count') + 1, version=F('version') + 1,
+        )
+        refresh_hot_score(instance.question_id)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    Question.objects.filter(pk=instance.question_id, answer_count__gt=0).update(
+        answer_count=F('answer_count') - 1, version=F('version') + 1,
+    )
+    refresh_hot_score(instance.question_id)
+
+
+@receiver(post_save, sender=Question)
+def question_created(sender, instance, created, raw=False, **kwargs):
+    # Иначе новый вопрос остаётся с hot_score = 0 и до первого голоса или ответа стоит ниже всех «горячих».
+    if created and not raw:
+        instance.hot_score = hot_score(instance.rating, instance.answer_count, instance.created_at)
+        Question.objects.filter(pk=instance.pk).update(hot_score=instance.hot_score)
+
+
+# Сайдбар (популярные теги, лучшие пользователи) кешируется; состав тегов и имена
+# пользователей меняются редко, поэтому сбрасываем кеш на этих записях,
+# а рейтинги подтягиваются по истечении SIDEBAR_CACHE_TIMEOUT.
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Для clear реагируем до удаления связей, пока ещё видно, каких вопросов оно касается.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    transaction.on_commit(invalidate_sidebar)
+    # Карточки вопросов показывают теги — поднимаем версию затронутых вопросов.
+    if not reverse:
+        Question.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+    elif pk_set:
+        Question.objects.filter(pk__in=pk_set).update(version=F('version') + 1)
+    else:
+        Question.objects.filter(tags=instance).update(version=F('version') + 1)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Tag)
+def sidebar_source_deleted(sender, **kwargs):
+    transaction.on_commit(invalidate_sidebar)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    invalidate_user(instance.pk)
+    # Сайдбар и карточки вопросов показывают имя автора; смена email, аватара или last_login их не касается.
+    renamed = instance.username != getattr(instance, '_saved_username', instance.username)
+    if renamed and not created and not raw and (update_fields is None or 'username' in update_fields):
+        transaction.on_commit(invalidate_sidebar)
+        Question.objects.filter(author=instance).update(version=F('version') + 1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+# Инкрементальная индексация для поиска (массовые bulk_create — через rebuild_search_index).
+@receiver(post_save, sender=Question)
+def question_saved_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index_question(instance)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index_answer(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted_index(sender, instance, **kwargs):
+    get_backend().remove_question(instance.id)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted_index(sender, instance, **kwargs):
+    get_backend().remove_answer(instance.id)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    # Переименование тега меняет карточки всех его вопросов.
+    if not created and not raw:
+        Question.objects.filter(tags=instance).update(version=F('version') + 1)
+
+
+# Кеш страниц для анонимов: новые вопросы и ответы, правки, отметка правильного ответа
+# (сохранение Answer), смена тегов. Голоса сбрасывают кеш в core/voting.py.
+# Поколения меняются после коммита: иначе параллельный запрос успел бы положить
+# под новое поколение страницу, собранную по ещё не закоммиченным данным.
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_pages_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        question_id = instance.pk
+        transaction.on_commit(lambda: invalidate_question_pages(question_id))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_pages_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        question_id = instance.question_id
+        transaction.on_commit(lambda: invalidate_question_pages(question_id))
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_pages_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_list_pages)
+
+
+# Префиксный индекс тегов для автодополнения: правки применяются после коммита,
+# чтобы откат транзакции не оставлял в памяти несуществующие теги.
+@receiver(post_save, sender=Tag)
+def tag_saved_index(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        transaction.on_commit(lambda: tag_index.add(instance.pk, instance.title))
+    else:
+        transaction.on_commit(lambda: tag_index.rename(instance.pk, instance.title))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted_index(sender, instance, **kwargs):
+    tag_id = instance.pk
+    transaction.on_commit(lambda: tag_index.remove(tag_id))
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_changed_index(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    delta = 1 if action == 'post_add' else -1
+    if not reverse:
+        tag_ids = set(pk_set) if pk_set is not None else set(instance.tags.values_list('pk', flat=True))
+        transaction.on_commit(lambda: tag_index.change_usage(tag_ids, delta))
+    elif pk_set is not None:
+        transaction.on_commit(lambda: tag_index.change_usage([instance.pk], delta * len(pk_set)))
+    else:
+        count = instance.question_set.count()
+        transaction.on_commit(lambda: tag_index.change_usage([instance.pk], -count))
@@ -0,0 +1,29 @@
+"""SQLite с профилем производительности из OPTIONS.
+
+Дополнительные ключи OPTIONS (в Django 4.2 их нет, в 5.1 похожие появились штатно):
+- 'pragmas': словарь PRAGMA, выполняемых на каждом новом соединении;
+- 'transaction_mode': 'IMMEDIATE' — транзакции сразу берут блокировку записи. С обычным BEGIN
+  транзакция, начавшаяся с чтения, при первой записи получает «database is locked» без ожидания
+  busy_timeout, если другой процесс уже пишет.
+"""
+from django.db.backends.sqlite3 import base
+
+CUSTOM_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in CUSTOM_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,69 @@
+// Автодополнение тегов: подсказки для последнего тега в поле через GET {url}?q=префикс.
+(function () {
+    var input = document.getElementById('id_tags');
+    var list = document.getElementById('tag-suggestions');
+    if (!input || !list) {
+        return;
+    }
+    var url = input.dataset.autocompleteUrl;
+    var timer = null;
+    var lastTerm = null;
+
+    function terms() {
+        return input.value.split(/,\s*/);
+    }
+
+    function hide() {
+        list.hidden = true;
+        list.innerHTML = '';
+    }
+
+    function choose(title) {
+        var parts = terms();
+        parts.pop();
+        parts.push(title, '');
+        input.value = parts.join(', ');
+        hide();
+        input.focus();
+    }
+
+    function show(tags) {
+        list.innerHTML = '';
+        tags.forEach(function (tag) {
+            var item = document.createElement('li');
+            item.textContent = tag.title;
+            item.addEventListener('mousedown', function (event) {
+                event.preventDefault();
+                choose(tag.title);
+            });
+            list.appendChild(item);
+        });
+        list.hidden = tags.length === 0;
+    }
+
+    function lookup() {
+        var term = terms().pop().trim();
+        if (term === lastTerm) {
+            return;
+        }
+        lastTerm = term;
+        if (!term) {
+            hide();
+            return;
+        }
+        fetch(url + '?q=' + encodeURIComponent(term), {headers: {'Accept': 'application/json'}})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (term === lastTerm) {
+                    show(data.tags);
+                }
+            })
+            .catch(hide);
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(lookup, 150);
+    });
+    input.addEventListener('blur', hide);
+})();
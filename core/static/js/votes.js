@@ -0,0 +1,79 @@
+// Голосование без перезагрузки страницы: формы .vote-form отправляются в JSON API (data-vote-url),
+// рейтинг обновляется на месте. Обычным POST форма уходит, только если API точно не применило голос
+// (401/403/404/405): повторный голос отменяет прежний, поэтому после сбоя сети или 5xx — сообщение об ошибке.
+(function () {
+    if (!window.fetch || !window.FormData) {
+        return;
+    }
+
+    function csrfToken(form) {
+        var input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function update(form, data) {
+        var message = form.querySelector('.vote-error');
+        if (message) {
+            message.remove();
+        }
+        document.querySelectorAll('[data-rating-id="' + form.dataset.rating + '"]').forEach(function (element) {
+            element.textContent = data.rating;
+        });
+        form.querySelectorAll('button[value]').forEach(function (button) {
+            var active = (button.value === 'up' && data.vote === 1) || (button.value === 'down' && data.vote === -1);
+            button.classList.toggle('voted', active);
+            button.setAttribute('aria-pressed', active ? 'true' : 'false');
+        });
+    }
+
+    // Коды, при которых API голос не записало и его можно отправить формой.
+    var CLASSIC_FALLBACK = [401, 403, 404, 405];
+
+    function showError(form) {
+        var message = form.querySelector('.vote-error');
+        if (!message) {
+            message = document.createElement('small');
+            message.className = 'vote-error text-red';
+            message.setAttribute('role', 'alert');
+            form.appendChild(message);
+        }
+        message.textContent = 'Не удалось проголосовать, обновите страницу';
+    }
+
+    function submitClassic(form, button) {
+        var input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = button.name;
+        input.value = button.value;
+        form.appendChild(input);
+        HTMLFormElement.prototype.submit.call(form);
+    }
+
+    document.addEventListener('submit', function (event) {
+        var form = event.target;
+        var button = event.submitter;
+        if (!form.classList.contains('vote-form') || !button || !button.value) {
+            return;
+        }
+        event.preventDefault();
+        var body = new FormData();
+        body.append('vote', button.value);
+        fetch(form.dataset.voteUrl, {
+            method: 'POST',
+            body: body,
+            credentials: 'same-origin',
+            headers: {'X-CSRFToken': csrfToken(form), 'Accept': 'application/json'}
+        })
+            .then(function (response) {
+                if (response.ok) {
+                    return response.json().then(function (data) { update(form, data); });
+                }
+                if (CLASSIC_FALLBACK.indexOf(response.status) !== -1) {
+                    submitClassic(form, button);
+                    return;
+                }
+                showError(form);
+            })
+            .catch(function () { showError(form); });
+    });
+})();
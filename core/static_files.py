@@ -0,0 +1,140 @@
+"""Статика для продакшена: хешированные имена, заранее сжатые копии и долгий кеш в браузере.
+
+collectstatic с PrecompressedManifestStaticFilesStorage кладёт рядом с текстовыми файлами .gz
+(и .br, если установлен пакет brotli). Отдавать их может nginx (gzip_static/brotli_static)
+или serve_static, если Django сам раздаёт STATIC_ROOT (STATIC_SERVE).
+"""
+import gzip
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml', '.ttf', '.otf')
+# Совсем маленькие файлы и те, что почти не сжались, оставляем как есть.
+MIN_COMPRESS_SIZE = 256
+MIN_COMPRESS_RATIO = 0.95
+# Хешированное имя меняется вместе с содержимым — такой файл можно кешировать «навсегда».
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(content):
+    """Сжатые варианты содержимого: {расширение: байты}. mtime=0 — одинаковый результат на каждой сборке."""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {
+        extension: data for extension, data in variants.items()
+        if len(data) <= len(content) * MIN_COMPRESS_RATIO
+    }
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+        if dry_run:
+            return
+        for name in sorted(filter(None, names)):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress_file(name)
+
+    def compress_file(self, name):
+        path = Path(self.path(name))
+        content = path.read_bytes()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for extension, data in compress(content).items():
+            path.with_name(path.name + extension).write_bytes(data)
+
+
+_hashed_names = {'files': None, 'names': frozenset()}
+
+
+def _is_hashed(name):
+    # Манифест загружается хранилищем один раз; множество его имён строится заново, только когда он сменился.
+    files = getattr(staticfiles_storage, 'hashed_files', None)
+    if files is not _hashed_names['files']:
+        _hashed_names.update(files=files, names=frozenset((files or {}).values()))
+    return name in _hashed_names['names']
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с q > 0; «*» разрешает всё, что не запрещено явно."""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return {
+        candidate for candidate, _ in ENCODINGS
+        if weights.get(candidate, weights.get('*', 0)) > 0
+    }
+
+
+def _cache_headers(response, name):
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if _is_hashed(name)
+        else f'public, max-age={settings.STATIC_MAX_AGE}'
+    )
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def serve_static(request, path):
+    """Файл из STATIC_ROOT: сжатый вариант по Accept-Encoding, для хешированных имён — immutable-кеш."""
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, name))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not full_path.is_file() or full_path.suffix in ('.gz', '.br'):
+        raise Http404
+
+    stat = full_path.stat()
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return _cache_headers(HttpResponseNotModified(), name)
+
+    content_type, _ = mimetypes.guess_type(full_path.name)
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding, served_path = None, full_path
+    if full_path.name.endswith(COMPRESSIBLE_EXTENSIONS):
+        for candidate, extension in ENCODINGS:
+            compressed = full_path.with_name(full_path.name + extension)
+            if candidate in accepted and compressed.is_file():
+                encoding, served_path = candidate, compressed
+                break
+
+    response = FileResponse(served_path.open('rb'), filename=full_path.name,
+                            content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return _cache_headers(response, name)
@@ -0,0 +1,113 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db.models import Count
+
+from core.models import Tag
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 20
+# Для коротких префиксов совпадений много: их топ запоминается до следующего изменения индекса.
+TOP_CACHE_PREFIX_LENGTH = 2
+
+
+class TagPrefixIndex:
+    """Префиксный индекс тегов в памяти процесса: отсортированные названия и бинарный поиск.
+
+    Меняется инкрементально из сигналов (core/signals.py); изменения из других процессов
+    подтягиваются полной перезагрузкой раз в TAG_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._ids = []
+        self._tags = {}
+        self._top = {}
+        self._loaded_at = None
+
+    def reload(self):
+        rows = Tag.objects.annotate(usage=Count('question')).values_list('id', 'title', 'usage')
+        ordered = sorted(rows, key=lambda row: (row[1].lower(), row[0]))
+        with self._lock:
+            self._keys = [title.lower() for _, title, _ in ordered]
+            self._ids = [tag_id for tag_id, _, _ in ordered]
+            self._tags = {tag_id: [title, usage] for tag_id, title, usage in ordered}
+            self._top = {}
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.TAG_INDEX_TTL:
+            self.reload()
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """Теги, начинающиеся с prefix (без учёта регистра), по убыванию числа вопросов."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._ensure_loaded()
+        short = len(prefix) <= TOP_CACHE_PREFIX_LENGTH
+        with self._lock:
+            if short and prefix in self._top:
+                return self._top[prefix][:limit]
+            start = bisect_left(self._keys, prefix)
+            end = bisect_right(self._keys, prefix + '\U0010ffff', lo=start)
+            best = heapq.nsmallest(
+                MAX_AUTOCOMPLETE_LIMIT if short else limit,
+                (self._tags[tag_id] for tag_id in self._ids[start:end]),
+                key=lambda tag: (-tag[1], tag[0].lower()),
+            )
+            result = [{'title': title, 'usage': usage} for title, usage in best]
+            if short:
+                self._top[prefix] = result
+            return result[:limit]
+
+    def _position(self, tag_id, title):
+        key = title.lower()
+        position = bisect_left(self._keys, key)
+        while self._ids[position] != tag_id:
+            position += 1
+        return position
+
+    def add(self, tag_id, title):
+        with self._lock:
+            if self._loaded_at is None or tag_id in self._tags:
+                return
+            key = title.lower()
+            position = bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._ids.insert(position, tag_id)
+            self._tags[tag_id] = [title, 0]
+            self._top = {}
+
+    def remove(self, tag_id):
+        with self._lock:
+            if tag_id not in self._tags:
+                return
+            title, _ = self._tags.pop(tag_id)
+            position = self._position(tag_id, title)
+            del self._keys[position]
+            del self._ids[position]
+            self._top = {}
+
+    def rename(self, tag_id, title):
+        with self._lock:
+            if tag_id not in self._tags or self._tags[tag_id][0] == title:
+                return
+            usage = self._tags[tag_id][1]
+            self.remove(tag_id)
+            self.add(tag_id, title)
+            self._tags[tag_id][1] = usage
+
+    def change_usage(self, tag_ids, delta):
+        with self._lock:
+            for tag_id in tag_ids:
+                if tag_id in self._tags:
+                    self._tags[tag_id][1] = max(0, self._tags[tag_id][1] + delta)
+            self._top = {}
+
+
+index = TagPrefixIndex()
@@ -0,0 +1,61 @@
+import threading
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.profiling import record_cache
+
+register = template.Library()
+
+CARD_TEMPLATE = 'core/question_card.html'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def card_cache_key(question):
+    # Версия вопроса растёт при любом изменении, видимом в карточке, поэтому старые ключи
+    # просто перестают запрашиваться и вытесняются по TTL — явная инвалидация не нужна.
+    return f'card:{question.pk}:{question.version}'
+
+
+def card_cache_stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def reset_card_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+@register.simple_tag
+def question_cards(questions):
+    """Пары (вопрос, HTML карточки): закешированные карточки берутся одним get_many, остальные рендерятся."""
+    questions = list(questions)
+    timeout = settings.QUESTION_CARD_CACHE_TIMEOUT
+    if not timeout:
+        return [(question, render_to_string(CARD_TEMPLATE, {'question': question})) for question in questions]
+
+    keys = [card_cache_key(question) for question in questions]
+    cached = cache.get_many(keys)
+    missing = {}
+    cards = []
+    for key, question in zip(keys, questions):
+        html = cached.get(key)
+        if html is None:
+            html = missing[key] = render_to_string(CARD_TEMPLATE, {'question': question})
+        cards.append((question, mark_safe(html)))
+    if missing:
+        cache.set_many(missing, timeout)
+
+    with _stats_lock:
+        _stats['hits'] += len(cached)
+        _stats['misses'] += len(missing)
+    record_cache(hits=len(cached), misses=len(missing))
+    return cards
@@ -1,3 +1,1120 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404, HttpResponse
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from PIL import Image
+
+from core.async_views import AsyncIndexView, AsyncQuestionDetailView
+from core.management.commands.generate_questions import Command as GenerateQuestionsCommand
+from core.db_router import ReplicaPinningMiddleware
+from core.tag_index import index as tag_index
+from core.sqlite_backend.base import DatabaseWrapper as SQLiteTunedWrapper
+from core.avatars import AVATAR_SIZES, variant_name
+from core.models import User, Question, Answer, Tag, Vote, AnswerVote
+from core.page_cache import _page_key, invalidate_question_pages, list_page_generations
+from core.pagination import cursor_paginate
+from core.profiling import RequestProfilingMiddleware, request_stats, reset_request_stats
+from core.sidebar import SIDEBAR_CACHE_KEY, refresh_sidebar, sidebar_context
+from core.static_files import PrecompressedManifestStaticFilesStorage, accepted_encodings, serve_static
+from core.ranking import hot_score
+from core.search import search_questions
+from core.templatetags.question_cards import card_cache_stats, reset_card_cache_stats
+from core.vote_buffer import buffer as vote_buffer
+from core.voting import vote_question, vote_answer
+
+
+class CacheIsolatedTestCase(TestCase):
+    # Кеш (LocMem) общий для всех тестов, а id в БД после отката повторяются.
+    def setUp(self):
+        cache.clear()
+
+
+def create_questions(count, tag=None, answers_per_question=2):
+    author = User.objects.create_user(username=f'author{User.objects.count()}', password='pass')
+    extra_tag = Tag.objects.create(title=f'extra{Tag.objects.count()}')
+    for i in range(count):
+        question = Question.objects.create(
+            title=f'Question {Question.objects.count()}', detailed='Text', author=author,
+        )
+        question.tags.add(extra_tag)
+        if tag:
+            question.tags.add(tag)
+        for j in range(answers_per_question):
+            Answer.objects.create(question=question, author=author, answer_text=f'Answer {j}')
+
+
+class ListingQueryCountTests(CacheIsolatedTestCase):
+    # Число запросов на страницу списка не должно зависеть от числа вопросов на ней.
+    # count, страница вопросов, prefetch тегов (сайдбар берётся из кеша).
+    LIST_PAGE_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(title='python')
+        create_questions(25, tag=cls.tag)
+
+    def setUp(self):
+        super().setUp()
+        refresh_sidebar()
+
+    def assert_constant_queries(self, url):
+        with self.assertNumQueries(self.LIST_PAGE_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_index(self):
+        response = self.assert_constant_queries(reverse('index'))
+        self.assertEqual(len(response.context['new_questions']), 20)
+        self.assertContains(response, 'Answers: 2')
+
+    def test_index_by_tag(self):
+        # Дополнительный запрос на поиск самого тега.
+        with self.assertNumQueries(self.LIST_PAGE_QUERIES + 1):
+            response = self.client.get(reverse('index'), {'tag': self.tag.title})
+        self.assertEqual(response.status_code, 200)
+
+    def test_hot(self):
+        response = self.assert_constant_queries(reverse('hot'))
+        self.assertEqual(len(response.context['new_questions']), 20)
+
+    def test_tag(self):
+        with self.assertNumQueries(self.LIST_PAGE_QUERIES + 1):
+            response = self.client.get(reverse('tag_page', args=[self.tag.title]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Answers: 2')
+        self.assertContains(response, 'Author: author')
+
+
+class AnswerCountTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+
+    def test_answer_post_increments_counter(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('question', args=[self.question.id]), {'answer_text': 'Answer'})
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 1)
+
+    def test_delete_decrements_counter(self):
+        answers = [Answer.objects.create(question=self.question, author=self.user, answer_text=str(i)) for i in range(3)]
+        answers[0].delete()
+        Answer.objects.filter(pk=answers[1].pk).delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 1)
+
+    def test_rebuild_command_fixes_drift(self):
+        Answer.objects.create(question=self.question, author=self.user, answer_text='Answer')
+        Question.objects.update(answer_count=42)
+        self.question.refresh_from_db()
+        version = self.question.version
+        with self.assertRaises(CommandError):
+            call_command('rebuild_answer_counts', '--check', stdout=StringIO())
+        call_command('rebuild_answer_counts', stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 1)
+        self.assertEqual(self.question.version, version + 1)
+        call_command('rebuild_answer_counts', '--check', stdout=StringIO())
+
+
+class FillDbTests(CacheIsolatedTestCase):
+    def test_rerun_keeps_counters_consistent(self):
+        # Второй прогон дописывает голоса и ответы к уже созданным вопросам через update_existing_questions.
+        for _ in range(2):
+            call_command('fill_db', 2, seed=1, batch_size=7, stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 20)
+        # Дописанные голоса и ответы поднимают версию карточек.
+        self.assertTrue(Question.objects.filter(version__gt=1).exists())
+        self.assertEqual(Answer.objects.count(), 400)
+        self.assertTrue(Vote.objects.exists())
+        call_command('rebuild_answer_counts', '--check', stdout=StringIO())
+        call_command('reconcile_ratings', '--check', stdout=StringIO())
+        self.assertEqual(search_questions('Question 7'), [Question.objects.get(title='Question 7').id])
+
+    def test_same_seed_same_data(self):
+        call_command('fill_db', 1, seed=3, stdout=StringIO())
+        first = list(Answer.objects.order_by('id').values_list('question__title', 'author__username', 'rating'))
+        Question.objects.all().delete()
+        call_command('fill_db', 1, seed=3, stdout=StringIO())
+        second = list(Answer.objects.order_by('id').values_list('question__title', 'author__username', 'rating'))
+        self.assertEqual(first, second)
+
+
+class GenerateQuestionsTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass')
+        for title in ('python', 'django', 'sqlite'):
+            Tag.objects.create(title=title)
+
+    def generate(self, **options):
+        call_command('generate_questions', stdout=StringIO(), stderr=StringIO(), **options)
+        return list(Question.objects.order_by('id'))
+
+    def test_batches_with_tags_and_answers(self):
+        questions = self.generate(count=5, batch_size=2, tags=2, answers=3, seed=1)
+        self.assertEqual(len(questions), 5)
+        self.assertEqual(len({question.slug for question in questions}), 5)
+        for question in questions:
+            self.assertEqual(question.tags.count(), 2)
+            self.assertEqual(question.answer_count, 3)
+        self.assertEqual(Answer.objects.count(), 15)
+        call_command('rebuild_answer_counts', '--check', stdout=StringIO())
+
+    def test_same_seed_same_questions(self):
+        first = [(q.title, q.detailed) for q in self.generate(count=3, seed=7)]
+        Question.objects.all().delete()
+        self.assertEqual([(q.title, q.detailed) for q in self.generate(count=3, seed=7)], first)
+
+    def test_slug_suffix_skips_existing_rows(self):
+        for title in ('dup', 'dup 2'):
+            Question.objects.create(title=title, detailed='Text', author=self.admin)
+        batch = [Question(slug='dup'), Question(slug='dup'), Question(slug='other')]
+        GenerateQuestionsCommand().unique_slugs(batch)
+        self.assertEqual([question.slug for question in batch], ['dup-3', 'dup-4', 'other'])
+
+
+class VotingTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='voter', password='pass')
+        cls.other = User.objects.create_user(username='other', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+        cls.answer = Answer.objects.create(question=cls.question, author=cls.user, answer_text='Answer')
+
+    def rating(self, obj):
+        obj.refresh_from_db(fields=['rating'])
+        return obj.rating
+
+    def test_new_flipped_and_retracted_vote(self):
+        self.assertEqual(vote_question(self.user, self.question, Vote.UPVOTE), 1)
+        vote_question(self.other, self.question, Vote.UPVOTE)
+        self.assertEqual(self.rating(self.question), 2)
+        self.assertEqual(vote_question(self.user, self.question, Vote.DOWNVOTE), -1)
+        self.assertEqual(self.rating(self.question), 0)
+        self.assertEqual(vote_question(self.user, self.question, Vote.DOWNVOTE), 0)
+        self.assertEqual(self.rating(self.question), 1)
+        self.assertFalse(Vote.objects.filter(user=self.user).exists())
+
+    def test_answer_vote_via_view(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('question', args=[self.question.id]),
+                         {'vote_answer': self.answer.id, 'vote_value': 'down'})
+        self.assertEqual(self.rating(self.answer), -1)
+
+    def test_reconcile_command_fixes_drift(self):
+        vote_answer(self.user, self.answer, AnswerVote.UPVOTE)
+        Question.objects.update(rating=10)
+        version = Question.objects.get(pk=self.question.pk).version
+        with self.assertRaises(CommandError):
+            call_command('reconcile_ratings', '--check', stdout=StringIO())
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertEqual(self.rating(self.question), 0)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).version, version + 1)
+        self.assertEqual(self.rating(self.answer), 1)
+        call_command('reconcile_ratings', '--check', stdout=StringIO())
+
+
+
+@override_settings(VOTE_BUFFERING=True, VOTE_BUFFER_INTERVAL=0, VOTE_BUFFER_SIZE=100)
+class VoteBufferTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'voter{i}', password='pass') for i in range(3)]
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.users[0])
+        cls.answer = Answer.objects.create(question=cls.question, author=cls.users[0], answer_text='Answer')
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(vote_buffer.flush)
+
+    def test_votes_wait_for_flush_and_are_deduplicated(self):
+        user = self.users[0]
+        self.assertEqual(vote_question(user, self.question, Vote.UPVOTE), 1)
+        self.assertEqual(vote_question(user, self.question, Vote.DOWNVOTE), -1)
+        self.assertEqual(vote_answer(user, self.answer, AnswerVote.UPVOTE), 1)
+        self.assertEqual(vote_answer(user, self.answer, AnswerVote.UPVOTE), 0)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(vote_buffer.flush(), 2)
+        self.assertEqual(Vote.objects.get().value, -1)
+        self.assertFalse(AnswerVote.objects.exists())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.rating, -1)
+        # После сброса повторный голос отменяет сохранённый.
+        self.assertEqual(vote_question(user, self.question, Vote.DOWNVOTE), 0)
+        vote_buffer.flush()
+        self.question.refresh_from_db()
+        self.assertEqual((self.question.rating, Vote.objects.count()), (0, 0))
+
+    def test_one_rating_update_per_target(self):
+        self.question.refresh_from_db()
+        version = self.question.version
+        for user in self.users:
+            vote_question(user, self.question, Vote.UPVOTE)
+        with CaptureQueriesContext(connection) as captured:
+            vote_buffer.flush()
+        rating_updates = [q['sql'] for q in captured if q['sql'].startswith('UPDATE "core_question" SET "rating"')]
+        self.assertEqual(len(rating_updates), 1)
+        self.question.refresh_from_db()
+        self.assertEqual((self.question.rating, self.question.version), (3, version + 1))
+        self.assertNotEqual(self.question.hot_score, 0)
+
+    @override_settings(VOTE_BUFFER_SIZE=2)
+    def test_size_threshold_flushes(self):
+        vote_question(self.users[0], self.question, Vote.UPVOTE)
+        self.assertFalse(Vote.objects.exists())
+        vote_answer(self.users[1], self.answer, AnswerVote.DOWNVOTE)
+        self.assertEqual((Vote.objects.count(), AnswerVote.objects.count(), len(vote_buffer)), (1, 1, 0))
+
+    def test_failed_flush_keeps_votes(self):
+        vote_question(self.users[0], self.question, Vote.UPVOTE)
+        with mock.patch('core.vote_buffer._write_kind', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                vote_buffer.flush()
+        vote_question(self.users[1], self.question, Vote.DOWNVOTE)
+        self.assertEqual(vote_buffer.flush(), 2)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.rating, 0)
+
+    @override_settings(VOTE_BUFFER_INTERVAL=60)
+    def test_failed_flush_schedules_retry(self):
+        vote_question(self.users[0], self.question, Vote.UPVOTE)
+        with mock.patch('core.vote_buffer._write_kind', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                vote_buffer.flush()
+        self.assertIsNotNone(vote_buffer._timer)
+        self.assertEqual(len(vote_buffer), 1)
+
+    def test_votes_for_deleted_question_are_dropped(self):
+        question = Question.objects.create(title='Gone', detailed='Text', author=self.users[0])
+        vote_question(self.users[0], question, Vote.UPVOTE)
+        question.delete()
+        self.assertEqual(vote_buffer.flush(), 1)
+        self.assertFalse(Vote.objects.exists())
+
+
+class TagAutocompleteTests(CacheIsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='asker', password='pass')
+        python, pytest = Tag.objects.create(title='python'), Tag.objects.create(title='Pytest')
+        Tag.objects.create(title='django')
+        for i in range(2):
+            Question.objects.create(title=f'Q{i}', detailed='Text', author=self.user).tags.add(pytest)
+        Question.objects.create(title='Q', detailed='Text', author=self.user).tags.add(python)
+        tag_index.reload()
+
+    def titles(self, prefix, limit=10):
+        return [tag['title'] for tag in tag_index.search(prefix, limit)]
+
+    def test_prefix_match_ranked_by_usage(self):
+        self.assertEqual(self.titles('py'), ['Pytest', 'python'])
+        self.assertEqual(self.titles('PYT'), ['Pytest', 'python'])
+        self.assertEqual(self.titles('pyth'), ['python'])
+        self.assertEqual(self.titles('py', limit=1), ['Pytest'])
+        self.assertEqual(self.titles('x'), [])
+        response = self.client.get(reverse('tag_autocomplete'), {'q': 'dj'})
+        self.assertEqual(response.json(), {'tags': [{'title': 'django', 'usage': 0}]})
+
+    def test_ask_updates_index_incrementally(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ask_question'), {'title': 'T', 'detailed': 'D', 'tags': 'python, pylint'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ask_question'), {'title': 'T2', 'detailed': 'D', 'tags': 'pylint'})
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_index.search('py'), [
+                {'title': 'pylint', 'usage': 2}, {'title': 'Pytest', 'usage': 2}, {'title': 'python', 'usage': 2},
+            ])
+
+    def test_ask_page_does_not_inline_tags(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ask_question'))
+        self.assertNotContains(response, 'django')
+        self.assertContains(response, reverse('tag_autocomplete'))
+
+
+class ViewerVoteStateTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='viewer', password='pass')
+        create_questions(6)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def index_queries(self):
+        # Первый запрос прогревает сайдбар и кеш карточек, которые сбрасывает голосование.
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        return response, len(queries)
+
+    def test_vote_state_costs_constant_queries(self):
+        questions = list(Question.objects.order_by('id'))
+        vote_question(self.user, questions[0], Vote.UPVOTE)
+        _, few = self.index_queries()
+        for question in questions[1:]:
+            vote_question(self.user, question, Vote.DOWNVOTE)
+        response, many = self.index_queries()
+        self.assertEqual(few, many)
+        self.assertContains(response, 'class="voted"', count=len(questions))
+        self.assertContains(response, 'value="up" class="voted"', count=1)
+
+    def test_question_page_highlights_question_and_answers(self):
+        question = Question.objects.first()
+        answer = question.answer_set.first()
+        vote_question(self.user, question, Vote.DOWNVOTE)
+        vote_answer(self.user, answer, AnswerVote.UPVOTE)
+        response = self.client.get(reverse('question', args=[question.id]))
+        self.assertContains(response, 'name="vote_question" value="down" class="voted"')
+        self.assertContains(response, 'name="vote_value" value="up" class="voted"', count=1)
+
+    @override_settings(VOTE_BUFFERING=True, VOTE_BUFFER_INTERVAL=0)
+    def test_pending_buffered_vote_is_highlighted(self):
+        self.addCleanup(vote_buffer.flush)
+        vote_question(self.user, Question.objects.first(), Vote.UPVOTE)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'value="up" class="voted"', count=1)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', USER_CACHE_TIMEOUT=300)
+class SessionUserCacheTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cached', password='pass')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('user_settings')
+        self.client.get(self.url)
+
+    def test_session_and_user_come_from_cache(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'cached')
+
+    def test_user_save_invalidates_cache(self):
+        self.user.email = 'renamed@example.com'
+        self.user.save(update_fields=['email'])
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'renamed@example.com')
+
+    def test_zero_timeout_reads_user_from_db(self):
+        with override_settings(USER_CACHE_TIMEOUT=0), self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_bench_sessions_command(self):
+        create_questions(1)
+        out = StringIO()
+        call_command('bench_sessions', 'cached_db', repeat=1, json=True, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['cached_db+user_cache']['index']['avg_auth_queries'], 0)
+        self.assertGreater(result['cached_db']['index']['avg_auth_queries'], 0)
+        self.assertFalse(User.objects.filter(username='bench_sessions').exists())
+
+
+class VoteApiTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='voter', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+        cls.answer = Answer.objects.create(question=cls.question, author=cls.user, answer_text='Answer')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_question_vote_returns_rating_and_state(self):
+        url = reverse('api_question_vote', args=[self.question.id])
+        self.assertEqual(self.client.post(url, {'vote': 'up'}).json(), {'rating': 1, 'vote': 1})
+        self.assertEqual(self.client.post(url, {'vote': 'down'}).json(), {'rating': -1, 'vote': -1})
+        self.assertEqual(self.client.post(url, {'vote': 'down'}).json(), {'rating': 0, 'vote': 0})
+
+    def test_answer_vote_is_one_request(self):
+        url = reverse('api_answer_vote', args=[self.answer.id])
+        response = self.client.post(url, {'vote': 'down'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'rating': -1, 'vote': -1})
+
+    def test_errors(self):
+        url = reverse('api_question_vote', args=[self.question.id])
+        responses = {
+            405: self.client.get(url),
+            400: self.client.post(url, {'vote': 'sideways'}),
+            404: self.client.post(reverse('api_answer_vote', args=[0]), {'vote': 'up'}),
+        }
+        self.client.logout()
+        responses[401] = self.client.post(url, {'vote': 'up'})
+        for status, response in responses.items():
+            self.assertEqual(response.status_code, status)
+            self.assertIn('error', response.json())
+        self.assertEqual(responses[405]['Allow'], 'POST')
+
+    @override_settings(VOTE_BUFFERING=True, VOTE_BUFFER_INTERVAL=0)
+    def test_buffered_vote_rating_includes_pending(self):
+        self.addCleanup(vote_buffer.flush)
+        other = User.objects.create_user(username='other', password='pass')
+        vote_question(other, self.question, Vote.UPVOTE)
+        url = reverse('api_question_vote', args=[self.question.id])
+        self.assertEqual(self.client.post(url, {'vote': 'up'}).json(), {'rating': 2, 'vote': 1})
+        self.assertFalse(Vote.objects.exists())
+
+
+class CursorPaginationTests(CacheIsolatedTestCase):
+    ORDERING = ('-rating', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author', password='pass')
+        # Много одинаковых рейтингов, чтобы проверить разбор «ничьих» по id.
+        for i in range(25):
+            Question.objects.create(title=f'Question {i}', detailed='Text', author=author, rating=i % 3)
+        cls.expected = list(Question.objects.order_by(*cls.ORDERING).values_list('id', flat=True))
+
+    def page(self, **params):
+        request = RequestFactory().get('/', params)
+        return cursor_paginate(Question.objects.all(), request, 10, self.ORDERING)
+
+    def test_walk_forward_and_back(self):
+        seen, page, pages = [], self.page(), []
+        while True:
+            pages.append(page)
+            seen += [q.id for q in page]
+            if not page.has_next():
+                break
+            page = self.page(after=page.next_cursor)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = self.page(before=pages[-1].previous_cursor)
+        self.assertEqual([q.id for q in previous], [q.id for q in pages[1]])
+        first = self.page(before=pages[1].previous_cursor)
+        self.assertEqual([q.id for q in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_walk_rows_created_within_one_millisecond(self):
+        base = timezone.now().replace(microsecond=123000)
+        for i, question in enumerate(Question.objects.order_by('id')):
+            Question.objects.filter(pk=question.pk).update(created_at=base + timedelta(microseconds=i * 37))
+        ordering = ('-created_at', '-id')
+        expected = list(Question.objects.order_by(*ordering).values_list('id', flat=True))
+        seen, params = [], {}
+        while True:
+            request = RequestFactory().get('/', params)
+            page = cursor_paginate(Question.objects.all(), request, 7, ordering)
+            seen += [q.id for q in page]
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        page = self.page(after='not-a-cursor')
+        self.assertEqual([q.id for q in page], self.expected[:10])
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_index_in_cursor_mode(self):
+        response = self.client.get(reverse('index'), {'sort': 'rating'})
+        self.assertEqual(response.status_code, 200)
+        page = response.context['new_questions']
+        self.assertTrue(page.is_cursor)
+        self.assertContains(response, '25 total')
+        self.assertIn('sort=rating', page.next_url)
+
+
+class SidebarTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', password='pass')
+        cls.bob = User.objects.create_user(username='bob', password='pass')
+        cls.python = Tag.objects.create(title='python')
+        cls.django = Tag.objects.create(title='django')
+        Tag.objects.create(title='unused')
+        for i in range(2):
+            question = Question.objects.create(title=f'Q{i}', detailed='Text', author=cls.alice, rating=-1)
+            question.tags.add(cls.python)
+        question = Question.objects.create(title='Q2', detailed='Text', author=cls.bob, rating=1)
+        question.tags.add(cls.django)
+        Answer.objects.create(question=question, author=cls.bob, answer_text='Answer', rating=3)
+
+    def test_ranking(self):
+        context = sidebar_context()
+        self.assertEqual([t['title'] for t in context['tags']], ['python', 'django'])
+        self.assertEqual([u['username'] for u in context['best_users']], ['bob', 'alice'])
+        self.assertEqual(context['best_users'][0]['total_rating'], 4)
+
+    def test_served_from_cache_and_invalidated_on_tag_change(self):
+        sidebar_context()
+        with self.assertNumQueries(0):
+            sidebar_context()
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(title='Q3', detailed='Text', author=self.bob)
+            question.tags.add(Tag.objects.create(title='new'))
+        self.assertIn('new', [t['title'] for t in sidebar_context()['tags']])
+
+
+class HotScoreTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+
+    def test_newer_question_wins_at_equal_activity(self):
+        now = timezone.now()
+        self.assertGreater(hot_score(5, 1, now), hot_score(5, 1, now - timedelta(days=1)))
+        self.assertGreater(hot_score(50, 0, now - timedelta(hours=1)), hot_score(0, 0, now))
+
+    def test_votes_and_answers_refresh_score(self):
+        question = Question.objects.create(title='Question', detailed='Text', author=self.user)
+        question.refresh_from_db()
+        initial = question.hot_score
+        vote_question(self.user, question, Vote.UPVOTE)
+        Answer.objects.create(question=question, author=self.user, answer_text='Answer')
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.hot_score, hot_score(1, 1, question.created_at))
+        self.assertGreater(question.hot_score, initial)
+
+    def test_hot_page_order(self):
+        old = Question.objects.create(title='Old', detailed='Text', author=self.user)
+        Question.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+        fresh = Question.objects.create(title='Fresh', detailed='Text', author=self.user)
+        call_command('refresh_hot_scores', stdout=StringIO())
+        response = self.client.get(reverse('hot'))
+        self.assertEqual([q.id for q in response.context['new_questions']], [fresh.id, old.id])
+
+    def test_asked_question_is_scored_on_insert(self):
+        older = Question.objects.create(title='Older', detailed='Text', author=self.user)
+        Question.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        vote_question(self.user, older, Vote.UPVOTE)
+        self.client.force_login(self.user)
+        self.client.post(reverse('ask_question'), {'title': 'Brand new', 'detailed': 'Text', 'tags': ''})
+        new = Question.objects.get(title='Brand new')
+        self.assertAlmostEqual(new.hot_score, hot_score(0, 0, new.created_at))
+        response = self.client.get(reverse('hot'))
+        self.assertEqual(response.context['new_questions'][0].id, new.id)
+
+
+class SearchTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+        cls.in_title = Question.objects.create(title='Как настроить Django кеш', detailed='Подробности', author=cls.user)
+        cls.in_body = Question.objects.create(title='Вопрос про сервер', detailed='Используем django', author=cls.user)
+        cls.in_answer = Question.objects.create(title='Другой вопрос', detailed='Текст', author=cls.user)
+        Answer.objects.create(question=cls.in_answer, author=cls.user, answer_text='Попробуйте Django')
+        Question.objects.create(title='Без совпадений', detailed='Текст', author=cls.user)
+
+    def test_ranked_results_include_answers(self):
+        ids = search_questions('django')
+        self.assertEqual(ids[0], self.in_title.id)
+        self.assertCountEqual(ids, [self.in_title.id, self.in_body.id, self.in_answer.id])
+
+    def test_incremental_index_on_save_and_delete(self):
+        self.in_body.title = 'Вопрос про nginx'
+        self.in_body.save()
+        self.assertEqual(search_questions('nginx'), [self.in_body.id])
+        self.in_body.delete()
+        self.assertEqual(search_questions('nginx'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(search_questions('"django" (:'), search_questions('django'))
+        self.assertEqual(search_questions('***'), [])
+
+    def test_rebuild_and_view(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('search'), {'q': 'кеш'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q.id for q in response.context['questions']], [self.in_title.id])
+
+    def test_search_does_not_query_votes(self):
+        # В выдаче поиска нет кнопок голосования — голоса пользователя не нужны.
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('search'), {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in captured.captured_queries if Vote._meta.db_table in q['sql']])
+
+
+@override_settings(AVATAR_PROCESSING='sync', MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarTests(CacheIsolatedTestCase):
+    @staticmethod
+    def image_file(color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), color).save(buffer, format='PNG')
+        return SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+
+    def test_variants_built_after_commit(self):
+        user = User.objects.create_user(username='user', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar = self.image_file()
+            user.save()
+        user.refresh_from_db()
+        self.assertTrue(user.avatar_hash)
+        self.assertIn(user.avatar_hash, user.avatar_small_webp_url)
+        for size in AVATAR_SIZES:
+            with default_storage.open(variant_name(user.avatar_hash, size, 'jpg')) as variant:
+                self.assertEqual(max(Image.open(variant).size), size)
+
+    def test_unchanged_avatar_is_not_reprocessed(self):
+        user = User.objects.create_user(username='user', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar = self.image_file()
+            user.save()
+        user = User.objects.get(pk=user.pk)
+        with mock.patch('core.models.schedule_avatar_processing') as schedule:
+            user.email = 'new@example.com'
+            user.save()
+        schedule.assert_not_called()
+
+
+class QuestionCardCacheTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        reset_card_cache_stats()
+
+    def test_repeat_render_hits_cache(self):
+        # Другая страница с тем же вопросом: мимо кеша страниц, но в кеш карточек.
+        self.client.get(reverse('index'))
+        self.client.get(reverse('hot'))
+        self.assertEqual(card_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_writes_bump_version(self):
+        versions = [self.question.version]
+        vote_question(self.user, self.question, Vote.UPVOTE)
+        Answer.objects.create(question=self.question, author=self.user, answer_text='Answer')
+        self.question.tags.add(Tag.objects.create(title='python'))
+        self.question.refresh_from_db()
+        versions.append(self.question.version)
+        self.question.title = 'Edited'
+        self.question.save()
+        versions.append(self.question.version)
+        self.assertEqual(versions, [1, 4, 5])
+
+    def test_author_rename_refreshes_cards(self):
+        self.client.get(reverse('index'))
+        self.user.username = 'renamed'
+        self.user.save(update_fields=['username'])
+        self.assertContains(self.client.get(reverse('hot')), 'renamed')
+        self.user.save(update_fields=['last_login'])
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.version, 2)
+
+    def test_settings_without_rename_keep_cards(self):
+        self.client.force_login(self.user)
+        sidebar_context()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('user_settings'), {'email': 'new@example.com', 'nick': 'user'})
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.version, 1)
+        self.assertIsNotNone(cache.get(SIDEBAR_CACHE_KEY))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('user_settings'), {'email': 'new@example.com', 'nick': 'renamed'})
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.version, 2)
+        self.assertIsNone(cache.get(SIDEBAR_CACHE_KEY))
+
+    def test_vote_shows_fresh_rating(self):
+        self.client.get(reverse('index'))
+        vote_question(self.user, self.question, Vote.UPVOTE)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, f'data-rating-id="question-{self.question.id}">1<')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+
+    def test_hit_after_miss(self):
+        url = reverse('question', args=[self.question.id])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Question')
+
+    def test_cache_key_ignores_unknown_params(self):
+        self.client.get(reverse('index'), {'sort': 'rating'})
+        self.assertEqual(self.client.get(reverse('index'), {'sort': 'rating', 'utm': 'x'})['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('index'), {'sort': 'date'})['X-Page-Cache'], 'MISS')
+
+    def test_writes_invalidate(self):
+        index, detail = reverse('index'), reverse('question', args=[self.question.id])
+        self.client.get(index)
+        self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            vote_question(self.user, self.question, Vote.UPVOTE)
+        self.assertContains(self.client.get(index), f'data-rating-id="question-{self.question.id}">1<')
+        self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            answer = Answer.objects.create(question=self.question, author=self.user, answer_text='New answer')
+        self.assertContains(self.client.get(detail), 'New answer')
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.is_correct = True
+            answer.save()
+        self.assertContains(self.client.get(detail), 'Correct answer')
+
+    def test_answer_vote_keeps_list_pages(self):
+        answer = Answer.objects.create(question=self.question, author=self.user, answer_text='Answer')
+        index, detail = reverse('index'), reverse('question', args=[self.question.id])
+        self.client.get(index)
+        self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            vote_answer(self.user, answer, AnswerVote.UPVOTE)
+        self.assertEqual(self.client.get(index)['X-Page-Cache'], 'HIT')
+        self.assertContains(self.client.get(detail), f'data-rating-id="answer-{answer.id}">1<')
+
+    def test_generations_bumped_after_commit(self):
+        # До коммита параллельный запрос не должен сохранить под новым поколением старые данные.
+        detail = reverse('question', args=[self.question.id])
+        self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(question=self.question, author=self.user, answer_text='New answer')
+            self.assertEqual(self.client.get(detail)['X-Page-Cache'], 'HIT')
+        self.assertContains(self.client.get(detail), 'New answer')
+
+    def test_authenticated_users_bypass_cache(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    @override_settings(PAGE_CACHE_TIMEOUT=1)
+    def test_stale_served_while_locked(self):
+        url = reverse('index')
+        self.client.get(url)
+        key = _page_key(RequestFactory().get(url), list_page_generations({}))
+        content, content_type, _, built_at = cache.get(key)
+        cache.set(key, (content, content_type, 0, built_at), 60)
+        cache.add(f'{key}:lock', 1, 10)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'STALE')
+        cache.delete(f'{key}:lock')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60, CONDITIONAL_PAGES=True)
+class ConditionalGetTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pass')
+        cls.question = Question.objects.create(title='Question', detailed='Text', author=cls.user)
+
+    def test_not_modified_without_queries(self):
+        url = reverse('question', args=[self.question.id])
+        response = self.client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_last_modified_waits_for_its_second_to_end(self):
+        url = reverse('question', args=[self.question.id])
+        clock = [time.time() + 100]
+        with mock.patch('time.time', lambda: clock[0]), mock.patch('time.time_ns', lambda: int(clock[0] * 1e9)):
+            self.client.get(url)
+            clock[0] += 1.5
+            first = self.client.get(url)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+            invalidate_question_pages(self.question.id)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Last-Modified'))
+            clock[0] += 1
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(parse_http_date(response['Last-Modified']), parse_http_date(first['Last-Modified']))
+
+    def test_cached_copy_keeps_validators_of_its_sidebar(self):
+        url = reverse('index')
+        first = self.client.get(url)
+        refresh_sidebar()
+        hit = self.client.get(url)
+        self.assertEqual(hit['X-Page-Cache'], 'HIT')
+        self.assertEqual(hit['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_writes_change_validators(self):
+        index, detail = reverse('index'), reverse('question', args=[self.question.id])
+        etags = {url: self.client.get(url)['ETag'] for url in (index, detail)}
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(question=self.question, author=self.user, answer_text='New answer')
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(etags[index], self.client.get(index, {'sort': 'rating'})['ETag'])
+
+    def test_authenticated_pages_have_no_validators(self):
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(reverse('index')).has_header('ETag'))
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_works_without_page_cache(self):
+        url = reverse('index')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(PROFILING_SERVER_TIMING=True, PAGE_CACHE_TIMEOUT=0)
+class ProfilingMiddlewareTests(CacheIsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_request_stats()
+        self.user = User.objects.create_user(username='user', password='password')
+        for i in range(3):
+            Question.objects.create(title=f'Question {i}', detailed='Text', author=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('index'))
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            self.assertIn(metric, timing)
+        self.assertEqual(request_stats()['index']['count'], 1)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_template_time_counted_on_page_cache_miss(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        template_ms = float(re.search(r'tpl;dur=([\d.]+)', response['Server-Timing']).group(1))
+        self.assertGreater(template_ms, 0)
+
+    def test_duplicate_queries_logged(self):
+        def n_plus_one(request):
+            for question in Question.objects.all():
+                question.author.username
+            return HttpResponse()
+
+        middleware = RequestProfilingMiddleware(n_plus_one)
+        with override_settings(PROFILING_DUPLICATE_THRESHOLD=2), self.assertLogs('core.profiling', 'WARNING'):
+            response = middleware(RequestFactory().get('/'))
+        self.assertIn('2 duplicates', response['Server-Timing'])
+
+    def test_stats_endpoint_requires_staff(self):
+        url = reverse('profiling_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertIn('profiling_stats', self.client.get(url).json())
+
+
+class BenchViewsCommandTests(CacheIsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        create_questions(3, tag=Tag.objects.create(title='python'))
+
+    def test_bench_queries_rolls_back_seeded_questions(self):
+        out = StringIO()
+        call_command('bench_queries', questions=10, repeat=1, json=True, stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue())['questions'], 10)
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertFalse(User.objects.filter(username='bench').exists())
+
+    def test_bench_search_rolls_back_corpus(self):
+        out = StringIO()
+        call_command('bench_search', 1, repeat=1, json=True, stdout=out, stderr=StringIO())
+        self.assertGreaterEqual(json.loads(out.getvalue())['runs'][0]['questions'], 10)
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertFalse(User.objects.filter(username='user0').exists())
+
+    def test_json_covers_routes_and_rolls_back_posts(self):
+        out = StringIO()
+        answers = Answer.objects.count()
+        call_command('bench_views', repeat=2, concurrency=0, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertIn('commit', results['meta'])
+        for name in ('index_date_p1', 'tag_p10', 'question_detail', 'search', 'vote_question', 'answer'):
+            self.assertEqual(results['client'][name]['count'], 2)
+        self.assertEqual(results['client']['answer']['status'], 302)
+        self.assertEqual(Answer.objects.count(), answers)
+        self.assertNotIn('http', results)
+
+
+class AsyncViewTests(TransactionTestCase):
+    # Запросы асинхронных страниц идут из других потоков со своими соединениями:
+    # данные должны быть закоммичены, поэтому TransactionTestCase.
+    def setUp(self):
+        cache.clear()
+        create_questions(3, tag=Tag.objects.create(title='python'))
+
+    async def render(self, view, **kwargs):
+        request = AsyncRequestFactory().get('/')
+        request.user = AnonymousUser()
+        response = await view(request, **kwargs)
+        await sync_to_async(response.render)()
+        return response
+
+    async def test_index_lists_questions_and_sidebar(self):
+        response = await self.render(AsyncIndexView.as_view())
+        self.assertContains(response, 'Question 2')
+        self.assertContains(response, 'python')
+
+    async def test_question_detail(self):
+        question = await Question.objects.afirst()
+        response = await self.render(AsyncQuestionDetailView.as_view(), id=question.id)
+        self.assertContains(response, question.title)
+        self.assertContains(response, 'Answer 1')
+        with self.assertRaises(Http404):
+            await self.render(AsyncQuestionDetailView.as_view(), id=0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # В тестах реплика — отдельная БД без репликации: запись видна на ней, только если чтение ушло на основную.
+    databases = {'default', 'replica'}
+
+    def view(self, request):
+        if request.method == 'POST':
+            Tag.objects.create(title='new')
+        return HttpResponse(str(Tag.objects.filter(title='new').exists()))
+
+    def request(self, method, cookies=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(self.view)(request)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        Tag.objects.create(title='new')
+        self.assertEqual(Tag.objects.all().db, 'replica')
+        self.assertFalse(Tag.objects.filter(title='new').exists())
+        self.assertTrue(Tag.objects.using('default').filter(title='new').exists())
+        with transaction.atomic():
+            self.assertTrue(Tag.objects.filter(title='new').exists())
+
+    def test_read_your_writes(self):
+        response = self.request('post')
+        self.assertEqual(response.content, b'True')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertEqual(self.request('get', {settings.REPLICA_PIN_COOKIE: '1'}).content, b'True')
+        response = self.request('get')
+        self.assertEqual(response.content, b'False')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class SQLiteProfileTests(TestCase):
+    def open(self, profile):
+        path = f'{tempfile.mkdtemp()}/profile.sqlite3'
+        settings_dict = {**connection.settings_dict, 'NAME': path, 'OPTIONS': settings.SQLITE_PROFILES[profile]}
+        wrapper = SQLiteTunedWrapper(settings_dict, alias=f'profile_{profile}')
+        wrapper.connect()
+        self.addCleanup(wrapper.close)
+        return wrapper, path
+
+    def test_tuned_profile_pragmas(self):
+        wrapper, _ = self.open('tuned')
+
+        def pragma(name):
+            return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+        self.assertEqual(pragma('journal_mode'), 'wal')
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('foreign_keys'), 1)
+
+    def test_immediate_transactions_take_write_lock(self):
+        for profile, locked in (('default', False), ('tuned', True)):
+            wrapper, path = self.open(profile)
+            wrapper.connection.execute('CREATE TABLE t (x)')
+            wrapper._start_transaction_under_autocommit()
+            other = sqlite3.connect(path, timeout=0, isolation_level=None)
+            self.addCleanup(other.close)
+            if locked:
+                with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                    other.execute('BEGIN IMMEDIATE')
+            else:
+                other.execute('BEGIN IMMEDIATE')
+                other.execute('ROLLBACK')
+            wrapper.connection.execute('ROLLBACK')
+
+
+class StaticPipelineTests(TestCase):
+    def test_accepted_encodings_respect_q_values(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br'), {'gzip', 'br'})
+        self.assertEqual(accepted_encodings('br;q=0, gzip'), {'gzip'})
+        self.assertEqual(accepted_encodings('BR; q=0.0, gzip;q=0.5'), {'gzip'})
+        self.assertEqual(accepted_encodings('*;q=0.1, gzip;q=0'), {'br'})
+        self.assertEqual(accepted_encodings('identity'), set())
+        self.assertEqual(accepted_encodings(''), set())
+
+    def test_check_static_command(self):
+        out = StringIO()
+        call_command('check_static', json=True, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['missing'], [])
+        self.assertEqual(result['external'], [])
+        self.assertTrue(all('fonts.g' in font for font in result['external_fonts']))
+        self.assertLess(result['gzip_bytes'], result['bytes'])
+
+    def test_serve_precompressed_hashed_file(self):
+        storages = {**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'core.static_files.PrecompressedManifestStaticFilesStorage',
+        }}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(STATIC_ROOT=directory.name, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.assertIsInstance(staticfiles_storage._wrapped, PrecompressedManifestStaticFilesStorage)
+            hashed = staticfiles_storage.stored_name('css/style.css')
+            self.assertNotEqual(hashed, 'css/style.css')
+            factory = RequestFactory()
+
+            response = serve_static(factory.get('/', HTTP_ACCEPT_ENCODING='gzip, br'), hashed)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            with staticfiles_storage.open(hashed) as original:
+                self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original.read())
+
+            response = serve_static(factory.get('/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0'), hashed)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            response = serve_static(factory.get('/', HTTP_ACCEPT_ENCODING='*, gzip;q=0'), hashed)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+            response = serve_static(factory.get('/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']), hashed)
+            self.assertEqual(response.status_code, 304)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+            response = serve_static(factory.get('/'), 'css/style.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(response['Cache-Control'], f'public, max-age={settings.STATIC_MAX_AGE}')
+            for path in (f'{hashed}.gz', 'css/missing.css', '../manage.py'):
+                with self.assertRaises(Http404):
+                    serve_static(factory.get('/'), path)
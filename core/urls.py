@@ -3,15 +3,36 @@ from core import views
 from django.conf import settings
 from django.conf.urls.static import static
 
+if settings.ASYNC_VIEWS:
+    # Под ASGI-сервером: независимые запросы страниц списков и вопроса выполняются параллельно.
+    from core import async_views
+    from core.page_cache import cache_anonymous_page, list_page_generations, question_page_generations
+
+    index_view = cache_anonymous_page(list_page_generations)(async_views.AsyncIndexView.as_view())
+    hot_view = cache_anonymous_page(list_page_generations)(async_views.AsyncHotQuestionsView.as_view())
+    question_view = cache_anonymous_page(question_page_generations)(async_views.AsyncQuestionDetailView.as_view())
+    tag_view = cache_anonymous_page(list_page_generations)(async_views.AsyncTagView.as_view())
+else:
+    index_view = views.IndexView.as_view()
+    hot_view = views.HotQuestionsView.as_view()
+    question_view = views.QuestionDetailView.as_view()
+    tag_view = views.TagView.as_view()
+
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('questions/<int:id>/', views.QuestionDetailView.as_view(), name='question'),
-    path('tag/<str:title>/', views.TagView.as_view(), name='tag_page'),
+    path('', index_view, name='index'),
+    path('hot/', hot_view, name='hot'),
+    path('questions/<int:id>/', question_view, name='question'),
+    path('tag/<str:title>/', tag_view, name='tag_page'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('tags/autocomplete/', views.tag_autocomplete, name='tag_autocomplete'),
+    path('api/questions/<int:id>/vote/', views.question_vote_api, name='api_question_vote'),
+    path('api/answers/<int:id>/vote/', views.answer_vote_api, name='api_answer_vote'),
     path('ask/', views.AskQuestionView.as_view(), name='ask_question'),
     path('settings/', views.UserSettingsView.as_view(), name='user_settings'),
     path('login/', views.LoginView.as_view(), name='login'),
     path('signup/', views.SignupView.as_view(), name='signup'),
     path('logout/', views.logout_view, name='logout_view'),
+    path('profiling/stats/', views.profiling_stats_view, name='profiling_stats'),
 ]
 
 if settings.DEBUG:
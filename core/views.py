@@ -3,31 +3,53 @@ from django.views.generic import TemplateView, DetailView, View
 from django.contrib.auth import get_user_model, authenticate, login, logout
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.mail import send_mail
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
-from core.models import Question, Tag, Answer, Vote, AnswerVote
-from django.db import models
-from django.db.models import Sum
-
-def paginate(objects_list, request, per_page=10):
-    paginator = Paginator(objects_list, per_page)
-    page_number = request.GET.get('page', 1)
-    try:
-        page = paginator.get_page(page_number)
-    except PageNotAnInteger:
-        page = paginator.get_page(1)
-    except EmptyPage:
-        page = paginator.get_page(paginator.num_pages)
-    return page
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from core.models import Question, Tag, Answer
+from core.voting import vote_question, vote_answer, parse_vote, current_rating, attach_user_votes, user_votes
+from core.vote_buffer import ANSWER, QUESTION
+from core.pagination import paginate, paginate_listing, page_links
+from core.sidebar import sidebar_context
+from core.search import search_questions
+from core.profiling import request_stats
+from core.tag_index import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, index as tag_index
+from core.page_cache import cache_anonymous_page, list_page_generations, question_page_generations
+from django.db import transaction
 
 def common_context():
-    User = get_user_model()
-    return {
-        'tags': Tag.objects.all(),
-        'best_users': User.objects.order_by('-id')[:5],
-    }
+    return sidebar_context()
+
+
+class ListingView(TemplateView):
+    """Страница со списком вопросов: get_listing() возвращает (queryset, ordering, доп. контекст)."""
+    QUESTIONS_PER_PAGE = 20
+    page_context_name = 'new_questions'
+
+    def get_listing(self):
+        raise NotImplementedError
+
+    def listing_context(self, page_obj, extra, sidebar):
+        return {
+            self.page_context_name: page_obj,
+            'pages': page_links(page_obj),
+            **extra,
+            **sidebar,
+        }
+
+    def get_page(self, questions, ordering):
+        page_obj = paginate_listing(questions, self.request, self.QUESTIONS_PER_PAGE, ordering)
+        page_obj.object_list = attach_user_votes(self.request.user, page_obj.object_list, QUESTION)
+        return page_obj
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        questions, ordering, extra = self.get_listing()
+        page_obj = self.get_page(questions, ordering)
+        context.update(self.listing_context(page_obj, extra, common_context()))
+        return context
 
 class LoginView(View):
     def get(self, request):
@@ -80,10 +102,10 @@ def logout_view(request):
     logout(request)
     return redirect('index')
 
-class IndexView(TemplateView):
+@method_decorator(cache_anonymous_page(list_page_generations), name='dispatch')
+class IndexView(ListingView):
     template_name = 'core/index.html'
     http_method_names = ['get', 'post']
-    QUESTIONS_PER_PAGE = 20
 
     def post(self, request, *args, **kwargs):
 
@@ -95,117 +117,100 @@ class IndexView(TemplateView):
             except Question.DoesNotExist:
                 return redirect(request.path)
 
-            vote_val = 1 if vote_value == "up" else -1
-
-            vote, created = Vote.objects.get_or_create(
-                user=request.user,
-                question=question,
-                defaults={"value": vote_val}
-            )
-            if not created and vote.value != vote_val:
-                vote.value = vote_val
-                vote.save()
-
-            total = Vote.objects.filter(question=question).aggregate(total=Sum('value'))['total'] or 0
-            question.rating = total
-            question.save()
+            vote_question(request.user, question, parse_vote(vote_value))
 
         return redirect(request.path)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_listing(self):
         sort = self.request.GET.get('sort', 'date')
         tag_title = self.request.GET.get('tag')
 
         if tag_title:
             tag = get_object_or_404(Tag, title=tag_title)
-            questions = Question.objects.filter(tags=tag)
+            questions = Question.objects.active().for_listing().filter(tags=tag)
         else:
-            questions = Question.objects.all()
+            questions = Question.objects.active().for_listing()
 
         if sort == 'rating':
-            questions = questions.order_by('-rating')
+            ordering = ('-rating', '-id')
+        elif sort == 'answers':
+            ordering = ('-answer_count', '-created_at', '-id')
+        elif sort == 'unanswered':
+            questions = questions.filter(answer_count=0)
+            ordering = ('-created_at', '-id')
         else:
-            questions = questions.order_by('-created_at')
+            ordering = ('-created_at', '-id')
 
-        page_obj = paginate(questions, self.request, self.QUESTIONS_PER_PAGE)
-        context.update({
-            'new_questions': page_obj,
-            'pages': page_obj.paginator.page_range,
-            'sort': sort,
-            'tag': tag_title if tag_title else None,
-            **common_context()
-        })
-        return context
+        return questions, ordering, {'sort': sort, 'tag': tag_title if tag_title else None}
 
-class HotQuestionsView(TemplateView):
+@method_decorator(cache_anonymous_page(list_page_generations), name='dispatch')
+class HotQuestionsView(ListingView):
     template_name = 'core/index.html'
-    QUESTIONS_PER_PAGE = 20
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        questions = Question.objects.order_by('-rating')
-        page_obj = paginate(questions, self.request, self.QUESTIONS_PER_PAGE)
-        context.update({
-            'new_questions': page_obj,
-            'pages': page_obj.paginator.page_range,
-            'sort': 'rating',
-            **common_context()
-        })
-        return context
+    def get_listing(self):
+        return Question.objects.active().for_listing(), ('-hot_score', '-id'), {'sort': 'hot'}
 
-class TagView(TemplateView):
+@method_decorator(cache_anonymous_page(list_page_generations), name='dispatch')
+class TagView(ListingView):
     template_name = 'core/tag.html'
+    page_context_name = 'questions'
+
+    def get_listing(self):
+        tag = get_object_or_404(Tag, title=self.kwargs.get('title'))
+        questions = Question.objects.active().for_listing().filter(tags=tag)
+        return questions, ('-created_at', '-id'), {'tag': tag}
+
+    def post(self, request, *args, **kwargs):
+        question_id = request.POST.get("question_id")
+        vote_value = request.POST.get("vote")
+        if question_id and vote_value and request.user.is_authenticated:
+            question = get_object_or_404(Question, id=question_id)
+            vote_question(request.user, question, parse_vote(vote_value))
+        return redirect(request.path)
+
+class SearchView(TemplateView):
+    template_name = 'core/search.html'
     QUESTIONS_PER_PAGE = 20
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        tag_title = self.kwargs.get('title')
-        tag = get_object_or_404(Tag, title=tag_title)
-        questions = Question.objects.filter(tags=tag).order_by('-created_at')
-        page_obj = paginate(questions, self.request, self.QUESTIONS_PER_PAGE)
+        query = self.request.GET.get('q', '').strip()
+        # Движок отдаёт id в порядке релевантности, страница догружается одним запросом списка.
+        page_obj = paginate(search_questions(query) if query else [], self.request, self.QUESTIONS_PER_PAGE)
+        questions = Question.objects.for_listing().in_bulk(page_obj.object_list)
+        page_obj.object_list = [questions[pk] for pk in page_obj.object_list if pk in questions]
         context.update({
-            'tag': tag,
             'questions': page_obj,
-            'pages': page_obj.paginator.page_range,
+            'pages': page_links(page_obj),
+            'query': query,
             **common_context()
         })
         return context
 
-    def post(self, request, *args, **kwargs):
-        question_id = request.POST.get("question_id")
-        vote_value = request.POST.get("vote")
-        if question_id and vote_value and request.user.is_authenticated:
-            question = Question.objects.get(id=question_id)
-            vote_val = 1 if vote_value == "up" else -1
-            vote, created = Vote.objects.get_or_create(
-                user=request.user,
-                question=question,
-                defaults={"value": vote_val}
-            )
-            if not created and vote.value != vote_val:
-                vote.value = vote_val
-                vote.save()
-            question.rating = Vote.objects.filter(question=question).aggregate(total=models.Sum("value"))["total"] or 0
-            question.save()
-        return redirect(request.path)
-
+@method_decorator(cache_anonymous_page(question_page_generations), name='dispatch')
 class QuestionDetailView(DetailView):
-    model = Question
+    queryset = Question.objects.select_related('author')
     template_name = "core/question.html"
     context_object_name = "question"
     pk_url_kwarg = "id"
     ANSWERS_PER_PAGE = 30
 
+    def answers_page(self, question_id):
+        answers = Answer.objects.filter(question_id=question_id).select_related('author')
+        page_obj = paginate_listing(answers, self.request, self.ANSWERS_PER_PAGE, ('-rating', '-created_at', '-id'))
+        page_obj.object_list = attach_user_votes(self.request.user, page_obj.object_list, ANSWER)
+        return page_obj
+
+    def question_vote(self, question_id):
+        return user_votes(self.request.user, QUESTION, [question_id]).get(question_id, 0)
+
+    def detail_context(self, page_obj, sidebar):
+        return {'answers_page': page_obj, 'pages': page_links(page_obj), **sidebar}
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        answers = self.object.answer_set.order_by('-rating', '-created_at')
-        page_obj = paginate(answers, self.request, self.ANSWERS_PER_PAGE)
-        context.update({
-            'answers_page': page_obj,
-            'pages': page_obj.paginator.page_range,
-            **common_context()
-        })
+        self.object.user_vote = self.question_vote(self.object.pk)
+        context.update(self.detail_context(self.answers_page(self.object.pk), common_context()))
         return context
 
     def post(self, request, *args, **kwargs):
@@ -213,26 +218,14 @@ class QuestionDetailView(DetailView):
 
         vote_value = request.POST.get("vote_question")
         if vote_value and request.user.is_authenticated:
-            val = 1 if vote_value == "up" else -1
-            vote, created = Vote.objects.get_or_create(user=request.user, question=question, defaults={"value": val})
-            if not created and vote.value != val:
-                vote.value = val
-                vote.save()
-            question.rating = Vote.objects.filter(question=question).aggregate(total=models.Sum("value"))["total"] or 0
-            question.save()
+            vote_question(request.user, question, parse_vote(vote_value))
             return redirect(request.path)
 
         answer_id = request.POST.get("vote_answer")
         vote_val = request.POST.get("vote_value")
         if answer_id and vote_val and request.user.is_authenticated:
-            answer = Answer.objects.get(id=answer_id)
-            val = 1 if vote_val == "up" else -1
-            vote, created = AnswerVote.objects.get_or_create(user=request.user, answer=answer, defaults={"value": val})
-            if not created and vote.value != val:
-                vote.value = val
-                vote.save()
-            answer.rating = AnswerVote.objects.filter(answer=answer).aggregate(total=models.Sum("value"))["total"] or 0
-            answer.save()
+            answer = get_object_or_404(Answer, id=answer_id, question=question)
+            vote_answer(request.user, answer, parse_vote(vote_val))
             return redirect(request.path)
 
         correct_answer_id = request.POST.get("mark_correct")
@@ -245,7 +238,8 @@ class QuestionDetailView(DetailView):
 
         answer_text = request.POST.get("answer_text", "").strip()
         if answer_text and request.user.is_authenticated:
-            answer = Answer.objects.create(question=question, author=request.user, answer_text=answer_text)
+            with transaction.atomic():
+                Answer.objects.create(question=question, author=request.user, answer_text=answer_text)
         return redirect(request.path)
 
 @method_decorator(login_required, name='dispatch')
@@ -323,3 +317,42 @@ class UserSettingsView(View):
             user.avatar = avatar
         user.save()
         return redirect('user_settings')
+
+def _vote_api(request, kind, model, target_id, vote):
+    # JSON-вариант голосования для votes.js: без редиректа и повторного рендера страницы.
+    # Ошибки тоже в JSON — по коду ответа скрипт решает, можно ли повторить голос обычной формой.
+    if request.method != 'POST':
+        response = JsonResponse({'error': 'Нужен POST'}, status=405)
+        response['Allow'] = 'POST'
+        return response
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    target = model.objects.filter(pk=target_id).first()
+    if target is None:
+        return JsonResponse({'error': 'Не найдено'}, status=404)
+    raw_value = request.POST.get('vote')
+    if raw_value not in ('up', 'down'):
+        return JsonResponse({'error': 'vote должен быть up или down'}, status=400)
+    current = vote(request.user, target, parse_vote(raw_value))
+    return JsonResponse({'rating': current_rating(kind, target.pk), 'vote': current})
+
+
+def question_vote_api(request, id):
+    return _vote_api(request, QUESTION, Question, id, vote_question)
+
+
+def answer_vote_api(request, id):
+    return _vote_api(request, ANSWER, Answer, id, vote_answer)
+
+
+def tag_autocomplete(request):
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), MAX_AUTOCOMPLETE_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    return JsonResponse({'tags': tag_index.search(request.GET.get('q', ''), max(limit, 1))})
+
+
+@staff_member_required
+def profiling_stats_view(request):
+    return JsonResponse(request_stats())
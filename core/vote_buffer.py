@@ -0,0 +1,197 @@
+"""Буфер голосов (VOTE_BUFFERING): голоса копятся в памяти процесса и пишутся пачками.
+
+Гарантии:
+- в буфере хранится итоговый голос пользователя за объект (1, -1 или 0 — отозван), повторные
+  голоса за тот же объект до сброса схлопываются в один;
+- сброс — одна транзакция: голоса создаются/меняются/удаляются пачками, рейтинг каждого объекта
+  меняется одним UPDATE на суммарную разницу; рейтинг всегда равен сумме сохранённых голосов;
+- сброс идёт каждые VOTE_BUFFER_INTERVAL секунд, при VOTE_BUFFER_SIZE голосах в буфере
+  и при штатном завершении процесса (atexit);
+- если сброс упал, голоса возвращаются в буфер (более новые голоса тех же пользователей не затираются);
+- до сброса голос не попадает в Question/Answer.rating в БД, поэтому списки и страницы его не видят;
+  ответы API учитывают его через current_rating() (pending_delta), а подсветка кнопок — через user_votes();
+- при аварийном завершении процесса теряются голоса за последние VOTE_BUFFER_INTERVAL секунд —
+  цена за отсутствие записи на каждый голос.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from core.models import Question, Answer, User, Vote, AnswerVote
+from core.page_cache import invalidate_question_page, invalidate_question_pages
+from core.ranking import refresh_hot_scores
+
+logger = logging.getLogger(__name__)
+
+QUESTION = 'question'
+ANSWER = 'answer'
+_MODELS = {
+    QUESTION: (Vote, Question),
+    ANSWER: (AnswerVote, Answer),
+}
+
+
+class VoteBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self._atexit_registered = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, kind, user_id, target_id, value):
+        """Ставит голос в буфер; возвращает итоговый голос пользователя (1, -1 или 0)."""
+        key = (kind, user_id, target_id)
+        with self._lock:
+            previous = self._pending.get(key)
+        if previous is None:
+            vote_model, _ = _MODELS[kind]
+            previous = vote_model.objects.filter(
+                user_id=user_id, **{f'{kind}_id': target_id},
+            ).values_list('value', flat=True).first() or 0
+        # Та же логика, что и у прямой записи: повторный голос с тем же значением отменяет голос.
+        current = 0 if previous == value else value
+
+        with self._lock:
+            self._pending[key] = current
+            full = len(self._pending) >= settings.VOTE_BUFFER_SIZE
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+        return current
+
+    def _schedule(self):
+        # Вызывается под self._lock: один таймер сброса на буфер.
+        if self._timer is None and settings.VOTE_BUFFER_INTERVAL:
+            self._timer = threading.Timer(settings.VOTE_BUFFER_INTERVAL, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending_delta(self, kind, target_id):
+        """На сколько изменят рейтинг объекта ещё не записанные голоса."""
+        with self._lock:
+            pending = {
+                user_id: value for (pending_kind, user_id, pending_target), value in self._pending.items()
+                if pending_kind == kind and pending_target == target_id
+            }
+        if not pending:
+            return 0
+        vote_model, _ = _MODELS[kind]
+        stored = dict(vote_model.objects.filter(
+            user_id__in=pending, **{f'{kind}_id': target_id},
+        ).values_list('user_id', 'value'))
+        return sum(value - stored.get(user_id, 0) for user_id, value in pending.items())
+
+    def pending_votes(self, kind, user_id, target_ids):
+        """Ещё не записанные голоса пользователя за объекты target_ids: {id объекта: голос}."""
+        with self._lock:
+            return {
+                target_id: self._pending[kind, user_id, target_id] for target_id in target_ids
+                if (kind, user_id, target_id) in self._pending
+            }
+
+    def flush(self):
+        """Записывает накопленные голоса; возвращает их число."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        try:
+            _write_votes(pending)
+        except Exception:
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+                # Иначе вернувшиеся голоса ждали бы следующего голоса или выхода процесса.
+                self._schedule()
+            raise
+        return len(pending)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Не удалось записать голоса из буфера, повтор при следующем сбросе')
+        finally:
+            close_old_connections()
+
+
+def _write_votes(pending):
+    by_kind = defaultdict(dict)
+    for (kind, user_id, target_id), value in pending.items():
+        by_kind[kind][user_id, target_id] = value
+
+    with transaction.atomic():
+        changed = {kind: _write_kind(kind, votes) for kind, votes in by_kind.items()}
+        rated_questions = changed.get(QUESTION, {})
+        if rated_questions:
+            refresh_hot_scores(Question.objects.filter(pk__in=rated_questions))
+
+    # Рейтинг ответа виден только на странице вопроса — списки сбрасываются лишь голосами за вопросы.
+    for question_id in set(rated_questions):
+        invalidate_question_pages(question_id)
+    for question_id in set(changed.get(ANSWER, {}).values()) - set(rated_questions):
+        invalidate_question_page(question_id)
+
+
+def _write_kind(kind, votes):
+    vote_model, target_model = _MODELS[kind]
+    target_field = f'{kind}_id'
+    user_ids = {user_id for user_id, _ in votes}
+    target_ids = {target_id for _, target_id in votes}
+
+    # Голоса за удалённые за это время объекты (и от удалённых пользователей) отбрасываются.
+    targets = dict(target_model.objects.filter(pk__in=target_ids).values_list(
+        'pk', 'question_id' if kind == ANSWER else 'pk',
+    ))
+    users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    stored = vote_model.objects.select_for_update().filter(
+        user_id__in=user_ids, **{f'{target_field}__in': target_ids},
+    )
+    existing = {(vote.user_id, getattr(vote, target_field)): vote for vote in stored}
+
+    deltas = defaultdict(int)
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, target_id), value in votes.items():
+        if target_id not in targets or user_id not in users:
+            continue
+        vote = existing.get((user_id, target_id))
+        previous = vote.value if vote else 0
+        if value == previous:
+            continue
+        deltas[target_id] += value - previous
+        if vote is None:
+            to_create.append(vote_model(user_id=user_id, value=value, **{target_field: target_id}))
+        elif value == 0:
+            to_delete.append(vote.pk)
+        else:
+            vote.value = value
+            to_update.append(vote)
+
+    vote_model.objects.bulk_create(to_create)
+    vote_model.objects.bulk_update(to_update, ['value'])
+    vote_model.objects.filter(pk__in=to_delete).delete()
+
+    extra = {'version': F('version') + 1} if kind == QUESTION else {}
+    for target_id, delta in deltas.items():
+        if delta:
+            target_model.objects.filter(pk=target_id).update(rating=F('rating') + delta, **extra)
+    # {id объекта: id вопроса, страницы которого устарели}
+    return {target_id: targets[target_id] for target_id, delta in deltas.items() if delta}
+
+
+buffer = VoteBuffer()
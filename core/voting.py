@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.models import Question, Answer, Vote, AnswerVote
+from core.page_cache import invalidate_question_page, invalidate_question_pages
+from core.ranking import refresh_hot_score
+from core.vote_buffer import ANSWER, QUESTION, buffer
+
+
+def current_rating(kind, target_id):
+    """Рейтинг вопроса (kind=QUESTION) или ответа (ANSWER) с учётом голосов, ждущих в буфере."""
+    model = Question if kind == QUESTION else Answer
+    rating = model.objects.filter(pk=target_id).values_list('rating', flat=True).get()
+    if settings.VOTE_BUFFERING:
+        rating += buffer.pending_delta(kind, target_id)
+    return rating
+
+
+def user_votes(user, kind, target_ids):
+    """Голоса пользователя за объекты страницы одним запросом: {id объекта: 1 или -1}."""
+    target_ids = list(target_ids)
+    if not user.is_authenticated or not target_ids:
+        return {}
+    vote_model = Vote if kind == QUESTION else AnswerVote
+    target_field = f'{kind}_id'
+    votes = dict(vote_model.objects.filter(
+        user=user, **{f'{target_field}__in': target_ids},
+    ).values_list(target_field, 'value'))
+    if settings.VOTE_BUFFERING:
+        votes.update(buffer.pending_votes(kind, user.pk, target_ids))
+    return votes
+
+
+def attach_user_votes(user, objects, kind):
+    """Проставляет объектам user_vote (1, -1 или 0) для подсветки кнопок; возвращает список объектов."""
+    objects = list(objects)
+    votes = user_votes(user, kind, [obj.pk for obj in objects])
+    for obj in objects:
+        obj.user_vote = votes.get(obj.pk, 0)
+    return objects
+
+
+def parse_vote(raw_value):
+    return Vote.UPVOTE if raw_value == 'up' else Vote.DOWNVOTE
+
+
+def _apply_vote(vote_model, target_model, target_field, user, target, value, **extra_updates):
+    # Рейтинг не пересчитывается через SUM по всем голосам: к нему атомарно
+    # прибавляется разница между новым и прежним голосом пользователя.
+    # Повторный голос с тем же значением отменяет голос.
+    with transaction.atomic():
+        vote, created = vote_model.objects.select_for_update().get_or_create(
+            user=user, **{target_field: target}, defaults={'value': value},
+        )
+        if created:
+            delta, current = value, value
+        elif vote.value == value:
+            vote.delete()
+            delta, current = -value, 0
+        else:
+            vote.value = value
+            vote.save(update_fields=['value'])
+            delta, current = 2 * value, value
+
+        target_model.objects.filter(pk=target.pk).update(rating=F('rating') + delta, **extra_updates)
+    return current
+
+
+def vote_question(user, question, value):
+    """Голос за вопрос; возвращает текущий голос пользователя (1, -1 или 0)."""
+    if settings.VOTE_BUFFERING:
+        return buffer.submit(QUESTION, user.pk, question.pk, value)
+    with transaction.atomic():
+        current = _apply_vote(Vote, Question, 'question', user, question, value, version=F('version') + 1)
+        refresh_hot_score(question.pk)
+    transaction.on_commit(lambda: invalidate_question_pages(question.pk))
+    return current
+
+
+def vote_answer(user, answer, value):
+    """Голос за ответ; возвращает текущий голос пользователя (1, -1 или 0)."""
+    if settings.VOTE_BUFFERING:
+        return buffer.submit(ANSWER, user.pk, answer.pk, value)
+    current = _apply_vote(AnswerVote, Answer, 'answer', user, answer, value)
+    transaction.on_commit(lambda: invalidate_question_page(answer.question_id))
+    return current
@@ -49,6 +49,8 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.RequestProfilingMiddleware',
+    'core.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +60,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Профилирование запросов (core.profiling): Server-Timing, поиск N+1, перцентили по URL
+PROFILING_ENABLED = config.getboolean('profiling', 'ENABLED', fallback=True)
+PROFILING_SERVER_TIMING = config.getboolean('profiling', 'SERVER_TIMING', fallback=DEBUG)
+PROFILING_DUPLICATE_THRESHOLD = config.getint('profiling', 'DUPLICATE_THRESHOLD', fallback=5)
+# JSON lines с метриками каждого запроса для manage.py profiling_stats (пусто — не писать)
+PROFILING_LOG_FILE = config.get('profiling', 'LOG_FILE', fallback='')
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -78,17 +87,111 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'project.wsgi.application'
 
+# Асинхронные страницы списков и вопроса (core.async_views); имеет смысл только под ASGI-сервером.
+ASYNC_VIEWS = config.getboolean('project', 'ASYNC_VIEWS', fallback=False)
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Постоянные соединения с проверкой перед повторным использованием вместо подключения на каждый запрос.
+CONN_MAX_AGE = config.getint('database', 'CONN_MAX_AGE', fallback=60)
+
+# Профили SQLite (core.sqlite_backend): 'tuned' — WAL, synchronous=NORMAL, mmap, большой кеш страниц,
+# ожидание блокировки до BUSY_TIMEOUT секунд и BEGIN IMMEDIATE; 'default' — настройки SQLite по умолчанию.
+SQLITE_PROFILES = {
+    'default': {},
+    'tuned': {
+        'timeout': config.getfloat('sqlite', 'BUSY_TIMEOUT', fallback=20),
+        'transaction_mode': 'IMMEDIATE',
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': config.getint('sqlite', 'MMAP_SIZE', fallback=256 * 1024 * 1024),
+            'cache_size': -config.getint('sqlite', 'CACHE_SIZE_KB', fallback=64 * 1024),
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+SQLITE_PROFILE = config.get('sqlite', 'PROFILE', fallback='tuned')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PROFILES[SQLITE_PROFILE],
+    },
+    # Реплика для чтения ([replica] NAME в conf/local.conf). Пока она не задана, это та же БД,
+    # и чтения на неё не направляются; в тестах создаётся отдельная БД, чтобы проверять маршрутизацию.
+    'replica': {
+        'ENGINE': config.get('replica', 'ENGINE', fallback='core.sqlite_backend'),
+        'NAME': config.get('replica', 'NAME', fallback=BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PROFILES[SQLITE_PROFILE] if not config.has_option('replica', 'ENGINE') else {},
+    },
+}
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = ['replica'] if config.has_option('replica', 'NAME') else []
+# Сколько секунд после записи чтения того же клиента идут на основную БД (задержка репликации).
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = config.getint('replica', 'PIN_SECONDS', fallback=10)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config.get('cache', 'BACKEND', fallback='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config.get('cache', 'LOCATION', fallback='askpupkin'),
     }
 }
 
+# Поисковый движок (путь к классу из core.search); пусто — FTS5 для SQLite, иначе поиск через LIKE
+SEARCH_BACKEND = config.get('search', 'BACKEND', fallback='')
+
+# Время жизни закешированных карточек вопросов в списках, секунд (0 — не кешировать)
+QUESTION_CARD_CACHE_TIMEOUT = config.getint('project', 'QUESTION_CARD_CACHE_TIMEOUT', fallback=3600)
+
+# Кеш общий для всех процессов (memcached, redis, БД), а не свой у каждого (locmem, dummy)
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Кеш целых страниц для анонимных посетителей: сколько секунд страница «свежая» (0 — выключен)
+# и сколько ещё её можно отдавать устаревшей, пока один запрос её перестраивает.
+# Поколения страниц живут в кеше: со своим кешем у каждого процесса правка в одном воркере
+# не сбросила бы страницы и ETag других — поэтому по умолчанию включён только с общим кешем.
+PAGE_CACHE_TIMEOUT = config.getint('project', 'PAGE_CACHE_TIMEOUT', fallback=60 if SHARED_CACHE else 0)
+PAGE_CACHE_STALE_TIMEOUT = config.getint('project', 'PAGE_CACHE_STALE_TIMEOUT', fallback=300)
+
+# Условные GET для анонимных страниц с кешем: ETag/Last-Modified по поколениям страниц и ответ 304
+CONDITIONAL_PAGES = config.getboolean('project', 'CONDITIONAL_PAGES', fallback=SHARED_CACHE)
+
+# Время жизни кеша сайдбара (популярные теги, лучшие пользователи), секунд
+SIDEBAR_CACHE_TIMEOUT = config.getint('project', 'SIDEBAR_CACHE_TIMEOUT', fallback=300)
+
+
+# Хранение сессий: 'db' (таблица django_session), 'cached_db' (кеш, БД — только при промахе и записи)
+# или 'signed_cookies' (данные в подписанной cookie, без обращений к хранилищу).
+# С кешем своим у каждого процесса выход и смена пароля не дошли бы до других воркеров — тогда по умолчанию 'db'.
+SESSION_MODE = config.get('project', 'SESSION_MODE', fallback='cached_db' if SHARED_CACHE else 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+# Пользователь сессии берётся из кеша (core.auth_cache), время жизни записи в секундах (0 — всегда из БД).
+# По той же причине, что и для сессий, включается по умолчанию только с общим кешем.
+AUTHENTICATION_BACKENDS = ['core.auth_cache.CachedModelBackend']
+USER_CACHE_TIMEOUT = config.getint('project', 'USER_CACHE_TIMEOUT', fallback=300 if SHARED_CACHE else 0)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -129,9 +232,40 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
+# Продакшен-сборка статики (core.static_files): хешированные имена из манифеста и сжатые .gz/.br рядом.
+# Требует collectstatic перед запуском; проверка сборки — manage.py check_static.
+STATIC_PIPELINE = config.getboolean('static', 'PIPELINE', fallback=False)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': ('core.static_files.PrecompressedManifestStaticFilesStorage' if STATIC_PIPELINE
+                    else 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+# Раздавать STATIC_ROOT самим Django (без nginx перед ним); нехешированные файлы кешируются STATIC_MAX_AGE секунд
+STATIC_SERVE = config.getboolean('static', 'SERVE', fallback=False)
+STATIC_MAX_AGE = config.getint('static', 'MAX_AGE', fallback=3600)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Обработка аватаров: 'thread' — в фоновом пуле потоков, 'sync' — сразу после коммита (для тестов)
+AVATAR_PROCESSING = config.get('project', 'AVATAR_PROCESSING', fallback='thread')
+AVATAR_WORKERS = config.getint('project', 'AVATAR_WORKERS', fallback=2)
+
+# Режим пагинации списков: 'pages' (номера страниц) или 'cursor' (keyset, без OFFSET и COUNT(*))
+PAGINATION_MODE = config.get('project', 'PAGINATION_MODE', fallback='pages')
+
+# Как часто префиксный индекс тегов (core.tag_index) перечитывается из БД целиком, секунды;
+# между перезагрузками он меняется по сигналам своего процесса.
+TAG_INDEX_TTL = config.getint('project', 'TAG_INDEX_TTL', fallback=300)
+
+# Буфер голосов (core.vote_buffer): голоса пишутся пачками раз в VOTE_BUFFER_INTERVAL секунд
+# или при VOTE_BUFFER_SIZE голосах. Голоса последних секунд теряются при падении процесса.
+VOTE_BUFFERING = config.getboolean('project', 'VOTE_BUFFERING', fallback=False)
+VOTE_BUFFER_INTERVAL = config.getfloat('project', 'VOTE_BUFFER_INTERVAL', fallback=1.0)
+VOTE_BUFFER_SIZE = config.getint('project', 'VOTE_BUFFER_SIZE', fallback=500)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 